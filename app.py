@@ -1,19 +1,262 @@
 import dash
-from dash import dcc, html, Input, Output
+import functools
+import json
+from dash import dcc, html, ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import os
+import uuid
+
+from base_sql import BaseSQL, construir_base
+from cache_figuras import CacheFiguras, normalizar
+from cliente import paquete
+from columnar import DatasetColumnar
+from compartido import cargar_compartido, firma_archivos, tramos
+from cuantiles import CAJA, PERCENTILES
+from cubo import CuboDiario
+from ejecucion import EjecutorCallbacks
+from exportacion import filtrar_bloques, registrar_exportacion
+from ingesta import IngestaIncremental, SeguidorCSV
+from metricas import etapa, instrumentar, registrar_ruta
+from reduccion import (
+    NOMBRES_GRANULARIDAD, elegir_granularidad, modo_render, presupuesto_puntos, reducir_series
+)
 
 # --------------------------------------------------------------------
 # LECTURA DE DATOS
 # --------------------------------------------------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PATH_VENTAS = os.path.join(BASE_DIR, "ventas_eventos.csv")
-PATH_VISTAS = os.path.join(BASE_DIR, "vistas_eventos.csv")
+PATH_VENTAS = os.environ.get("DASH_EVENTOS_VENTAS", os.path.join(BASE_DIR, "ventas_eventos.csv"))
+PATH_VISTAS = os.environ.get("DASH_EVENTOS_VISTAS", os.path.join(BASE_DIR, "vistas_eventos.csv"))
+
+# Dataset columnar generado con `python columnar.py` (opcional)
+DIR_COLUMNAR = os.environ.get("DASH_EVENTOS_COLUMNAR")
+# Directorio de memoria compartida entre workers, p. ej. /dev/shm/dash_eventos (opcional)
+DIR_COMPARTIDO = os.environ.get("DASH_EVENTOS_COMPARTIDO")
+# Archivo SQLite para la cache de figuras compartida entre workers (opcional)
+PATH_CACHE = os.environ.get("DASH_EVENTOS_CACHE")
+CACHE_MAX_MB = int(os.environ.get("DASH_EVENTOS_CACHE_MB", "64"))
+# Segundos entre revisiones de filas nuevas en los CSV; 0 desactiva la ingesta
+SEGUNDOS_INGESTA = float(os.environ.get("DASH_EVENTOS_INGESTA", "0"))
+# Filas por bloque para construir sólo el cubo sin guardar las filas crudas;
+# 0 carga las tablas completas en memoria
+FILAS_BLOQUE = int(os.environ.get("DASH_EVENTOS_BLOQUE", "0"))
+# Archivo SQLite usado como backend de consultas en lugar del cubo (opcional)
+PATH_SQLITE = os.environ.get("DASH_EVENTOS_SQLITE")
+CONEXIONES_SQLITE = int(os.environ.get("DASH_EVENTOS_SQLITE_CONEXIONES", "4"))
+# Filtrado y figuras en el navegador a partir de un resumen enviado con el layout
+MODO_CLIENTE = os.environ.get("DASH_EVENTOS_CLIENTE", "0") == "1"
+# Hilos del pool donde corren los callbacks de figuras; 0 los ejecuta en el hilo de la petición
+HILOS_CALLBACKS = int(os.environ.get("DASH_EVENTOS_HILOS", "0"))
+# Exportaciones (/exportar) simultáneas por worker
+EXPORTACIONES_SIMULTANEAS = int(os.environ.get("DASH_EVENTOS_EXPORTACIONES", "2"))
+FILAS_EXPORTACION = 50_000
+
+if DIR_COLUMNAR:
+    ARCHIVOS_FUENTE = [os.path.join(DIR_COLUMNAR, tabla, "esquema.json") for tabla in ("ventas", "vistas")]
+else:
+    ARCHIVOS_FUENTE = [PATH_VENTAS, PATH_VISTAS]
+
+
+def cargar_fuentes():
+    if DIR_COLUMNAR:
+        return {
+            "ventas": DatasetColumnar(os.path.join(DIR_COLUMNAR, "ventas")).leer(),
+            "vistas": DatasetColumnar(os.path.join(DIR_COLUMNAR, "vistas")).leer(),
+        }
+    return {
+        "ventas": pd.read_csv(PATH_VENTAS, parse_dates=["Fecha"]),
+        "vistas": pd.read_csv(PATH_VISTAS, parse_dates=["Fecha"]),
+    }
+
+
+# Columnas de vistas que usa el cubo (la carga por bloques no lee el resto)
+COLUMNAS_VISTAS_CUBO = ["Fecha", "ID Usuario", "Ubicación", "Tiempo de Visualización"]
+
+
+def bloques_fuentes(filas_bloque):
+    """Iteradores de bloques de ventas y vistas para la carga por bloques."""
+    if DIR_COLUMNAR:
+        return (
+            DatasetColumnar(os.path.join(DIR_COLUMNAR, "ventas")).bloques(),
+            DatasetColumnar(os.path.join(DIR_COLUMNAR, "vistas")).bloques(columnas=COLUMNAS_VISTAS_CUBO),
+        )
+    if ingesta:
+        # A través de los seguidores, para que la ingesta continúe donde terminó la carga
+        return (
+            ingesta.seguidores["ventas"].leer_bloques(filas_bloque),
+            ingesta.seguidores["vistas"].leer_bloques(filas_bloque, usecols=COLUMNAS_VISTAS_CUBO),
+        )
+    return (
+        pd.read_csv(PATH_VENTAS, parse_dates=["Fecha"], chunksize=filas_bloque),
+        pd.read_csv(PATH_VISTAS, parse_dates=["Fecha"], chunksize=filas_bloque, usecols=COLUMNAS_VISTAS_CUBO),
+    )
+
+
+def incorporar_filas(nuevas, reiniciado):
+    """Suma las filas nuevas de la ingesta a las tablas y al cubo."""
+    global df_ventas, df_vistas, cubo
+    if reiniciado:
+        df_ventas, df_vistas = nuevas["ventas"], nuevas["vistas"]
+        cubo = CuboDiario.desde_tablas(df_ventas, df_vistas)
+        ingesta.publicar_version()
+        precalcular_figuras()
+        return
+    ventas_nuevas = nuevas.get("ventas")
+    vistas_nuevas = nuevas.get("vistas")
+    # En la carga por bloques no hay tablas crudas que extender
+    if ventas_nuevas is not None and df_ventas is not None:
+        df_ventas = pd.concat([df_ventas, ventas_nuevas], ignore_index=True)
+    if vistas_nuevas is not None and df_vistas is not None:
+        df_vistas = pd.concat([df_vistas, vistas_nuevas], ignore_index=True)
+    cubo = cubo.agregar(ventas_nuevas, vistas_nuevas)
+    # La versión de la cache avanza recién con el cubo nuevo en su lugar
+    ingesta.publicar_version()
+    precalcular_figuras()
+
+
+def recargar_por_bloques():
+    """Un CSV se reemplazó: el cubo se vuelve a armar por bloques, como al arrancar."""
+    global cubo
+    cubo = CuboDiario.desde_bloques(*bloques_fuentes(FILAS_BLOQUE))
+    ingesta.publicar_version()
+    precalcular_figuras()
+
+
+# La ingesta incremental sólo aplica a los CSV leídos directamente
+if SEGUNDOS_INGESTA and not (DIR_COLUMNAR or DIR_COMPARTIDO or PATH_SQLITE):
+    ingesta = IngestaIncremental(
+        {"ventas": SeguidorCSV(PATH_VENTAS), "vistas": SeguidorCSV(PATH_VISTAS)},
+        al_actualizar=incorporar_filas,
+        # En la carga por bloques no se lee ningún archivo entero
+        al_reiniciar=recargar_por_bloques if FILAS_BLOQUE else None,
+    )
+else:
+    ingesta = None
+
+# Firma de las fuentes que carga este worker; es la versión de sus datos
+# para la cache (ver version_datos). Se toma antes de leer: si un archivo
+# cambia después, este worker nunca guarda figuras con la firma nueva.
+firma_cargada = firma_archivos(*ARCHIVOS_FUENTE)
+
+if PATH_SQLITE:
+    # Backend SQL: el primer worker construye la base y todos la comparten
+    df_ventas = df_vistas = cubo = None
+    with etapa("carga_datos", callback="arranque"):
+        if DIR_COLUMNAR:
+            bloques_sql = (
+                DatasetColumnar(os.path.join(DIR_COLUMNAR, "ventas")).bloques(),
+                DatasetColumnar(os.path.join(DIR_COLUMNAR, "vistas")).bloques(),
+            )
+        else:
+            filas_sql = FILAS_BLOQUE or 500_000
+            bloques_sql = (
+                pd.read_csv(PATH_VENTAS, parse_dates=["Fecha"], chunksize=filas_sql),
+                pd.read_csv(PATH_VISTAS, parse_dates=["Fecha"], chunksize=filas_sql),
+            )
+        construir_base(PATH_SQLITE, firma_cargada, *bloques_sql)
+        base_sql = BaseSQL(PATH_SQLITE, CONEXIONES_SQLITE)
+elif FILAS_BLOQUE:
+    # Carga por bloques: el cubo se arma sin materializar las filas crudas
+    df_ventas = df_vistas = None
+    with etapa("cubo", callback="arranque") as e:
+        cubo = CuboDiario.desde_bloques(*bloques_fuentes(FILAS_BLOQUE))
+        e.filas_salida = len(cubo.ventas) + len(cubo.vistas)
+else:
+    with etapa("carga_datos", callback="arranque") as e:
+        if ingesta:
+            tablas = ingesta.cargar_inicial()
+        elif DIR_COMPARTIDO:
+            tablas = cargar_compartido(DIR_COMPARTIDO, firma_cargada, cargar_fuentes)
+        else:
+            tablas = cargar_fuentes()
+
+        df_ventas = tablas["ventas"]
+        df_vistas = tablas["vistas"]
+        e.filas_salida = len(df_ventas) + len(df_vistas)
+
+    # ----------------------------------------------------------------
+    # PRE-AGREGADOS (se calculan al cargar y se actualizan con la ingesta)
+    # ----------------------------------------------------------------
+    with etapa("cubo", filas_entrada=len(df_ventas) + len(df_vistas), callback="arranque") as e:
+        if DIR_COMPARTIDO:
+            # En memoria compartida Fecha sigue como número de día: se
+            # expande tramo a tramo para no copiar la columna en cada worker
+            cubo = CuboDiario.desde_bloques(tramos(df_ventas, 500_000), tramos(df_vistas, 500_000))
+        else:
+            cubo = CuboDiario.desde_tablas(df_ventas, df_vistas)
+        e.filas_salida = len(cubo.ventas) + len(cubo.vistas)
+
+if ingesta:
+    # Las filas leídas al arrancar ya están en el cubo
+    ingesta.publicar_version()
+
+
+def fuente():
+    """Origen de las consultas: la base SQL si está configurada, si no el cubo."""
+    return base_sql if PATH_SQLITE else cubo
+
+
+def bloques_exportacion(tabla, start_date, end_date, selecciones):
+    """Filas crudas de `tabla` filtradas como en los callbacks, por bloques."""
+    if PATH_SQLITE:
+        return base_sql.filas(tabla, start_date, end_date, selecciones, FILAS_EXPORTACION)
+    df = {"ventas": df_ventas, "vistas": df_vistas}[tabla]
+    if df is not None and DIR_COMPARTIDO:
+        bloques = tramos(df, FILAS_EXPORTACION)
+    elif df is not None:
+        bloques = (df.iloc[i:i + FILAS_EXPORTACION] for i in range(0, len(df), FILAS_EXPORTACION))
+    elif DIR_COLUMNAR:
+        # Carga por bloques: no hay tablas crudas en memoria, se releen sólo
+        # los meses de la ventana
+        bloques = DatasetColumnar(os.path.join(DIR_COLUMNAR, tabla)).bloques(start_date, end_date)
+    else:
+        ruta = {"ventas": PATH_VENTAS, "vistas": PATH_VISTAS}[tabla]
+        bloques = pd.read_csv(ruta, parse_dates=["Fecha"], chunksize=FILAS_EXPORTACION)
+    return filtrar_bloques(bloques, start_date, end_date, selecciones)
+
+
+# --------------------------------------------------------------------
+# CACHE DE FIGURAS (se invalida cuando cambian los datos)
+# --------------------------------------------------------------------
+def version_datos():
+    # Con ingesta, la versión son los bytes ya incorporados al cubo de este
+    # worker (se publica después de reemplazarlo), y se lee antes de
+    # calcular: una figura se guarda a lo sumo con una clave más vieja que
+    # sus datos, nunca con una más nueva.
+    # Sin ingesta, la firma de lo que se cargó (o de la base SQL abierta),
+    # no la de los archivos en este momento.
+    if ingesta:
+        return ingesta.version()
+    if PATH_SQLITE:
+        return base_sql.firma
+    return firma_cargada
+
+
+if PATH_CACHE:
+    cache_figuras = CacheFiguras(
+        PATH_CACHE,
+        version=version_datos,
+        max_bytes=CACHE_MAX_MB * 1024 * 1024,
+    )
+else:
+    cache_figuras = None
+
+
+def memoizar(nombre):
+    return cache_figuras.memoizar(nombre) if cache_figuras else (lambda funcion: funcion)
+
+# --------------------------------------------------------------------
+# POOL DE CALLBACKS (superación de peticiones viejas y single-flight)
+# --------------------------------------------------------------------
+ejecutor = EjecutorCallbacks(HILOS_CALLBACKS) if HILOS_CALLBACKS else None
+
 
-df_ventas = pd.read_csv(PATH_VENTAS, parse_dates=["Fecha"])
-df_vistas = pd.read_csv(PATH_VISTAS, parse_dates=["Fecha"])
+def en_segundo_plano(nombre):
+    return ejecutor.en_segundo_plano(nombre) if ejecutor else (lambda funcion: funcion)
 
 # --------------------------------------------------------------------
 # INICIALIZAR APP
@@ -21,6 +264,17 @@ df_vistas = pd.read_csv(PATH_VISTAS, parse_dates=["Fecha"])
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
 
+# Histogramas de cada etapa en /metrics (formato Prometheus)
+registrar_ruta(server)
+
+# Filas detrás de cada gráfica en CSV o XLSX (/exportar/<pestaña>/<tabla>.<formato>)
+registrar_exportacion(server, bloques_exportacion, EXPORTACIONES_SIMULTANEAS)
+
+# Cada worker revisa los CSV por su cuenta (sin --preload en gunicorn,
+# para que el hilo exista en cada proceso)
+if ingesta:
+    ingesta.iniciar(SEGUNDOS_INGESTA)
+
 # --------------------------------------------------------------------
 # ESTILOS DE TABS
 # --------------------------------------------------------------------
@@ -50,390 +304,668 @@ tab_selected_style = {
 # --------------------------------------------------------------------
 # LAYOUT
 # --------------------------------------------------------------------
-app.layout = dbc.Container(
-    fluid=True,
-    style={
-        "height": "100vh",
-        "overflow": "hidden",  
-        "backgroundColor": "#f0f2f5",
-        "padding": "0"
-    },
-    children=[
-
-        # ENCABEZADO
-        dbc.Row(
-            style={"height": "60px", "backgroundColor": "white", "margin": "0.5rem"},
-            children=[
-                dbc.Col(
-                    html.H1(
-                        "Dashboard de Métricas de Eventos",
-                        style={"textAlign": "center", "margin": "0.5rem"}
-                    ),
-                    width=12
-                )
-            ],
-        ),
-
-        # CONTENEDOR DE TABS (OCUPA EL RESTO DE LA ALTURA)
-        dbc.Row(
-            style={"height": "calc(100vh - 60px)", "margin": "0"},
-            children=[
-                dbc.Col(
-                    dcc.Tabs(
-                        style=tabs_styles,
-                        children=[
-
-                            # ========== TAB 1: TASA DE CONVERSIÓN ==========
-                            dcc.Tab(
-                                label="Tasa de Conversión de Ventas",
-                                style=tab_style,
-                                selected_style=tab_selected_style,
-                                children=[
-                                    dbc.Row(
-                                        style={"height": "100%", "margin": "0"},
-                                        children=[
-                                            # Columna de FILTROS (width=2)
-                                            dbc.Col(
-                                                width=2,
-                                                style={
-                                                    "backgroundColor": "#ffffff",
-                                                    "padding": "1rem",
-                                                    "borderRadius": "5px",
-                                                    "maxHeight": "100%",
-                                                    "overflowY": "visible"
-                                                },
-                                                children=[
-                                                    html.H5("Filtros", style={"marginBottom": "1rem"}),
-
-                                                    html.P(
-                                                        "La tasa de conversión de ventas mide cuántas "
-                                                        "visualizaciones se convirtieron en ventas exitosas.",
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-
-                                                    html.Label("Tipo de análisis:"),
-                                                    dcc.RadioItems(
-                                                        id="tipo-analisis-conversion",
-                                                        options=[
-                                                            {"label": "Mostrar todo", "value": "todo"},
-                                                            {"label": "Comparar por ciudades", "value": "comparar"}
-                                                        ],
-                                                        value="todo",
-                                                        inline=True,
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-
-                                                    html.Label("Rango de fechas:"),
-                                                    dcc.DatePickerRange(
-                                                        id="rango-fechas-conversion",
-                                                        start_date=df_ventas["Fecha"].min(),
-                                                        end_date=df_ventas["Fecha"].max(),
-                                                        display_format="YYYY-MM-DD",
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-
-                                                    html.Label("Filtrar por ciudad:"),
-                                                    dcc.Dropdown(
-                                                        id="filtro-ciudad-conversion",
-                                                        options=[{"label": c, "value": c} 
-                                                                 for c in df_ventas["Ubicación"].unique()],
-                                                        value=df_ventas["Ubicación"].unique(),
-                                                        multi=True,
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-                                                ]
-                                            ),
-
-                                            # Columna de GRÁFICA (width=10)
-                                            dbc.Col(
-                                                width=10,
-                                                style={"padding": "1rem", "overflowY": "auto"},
-                                                children=[
-                                                    dcc.Graph(id="grafico-conversion", style={"height": "100%"})
-                                                ]
-                                            )
-                                        ]
-                                    )
-                                ]
-                            ),
-
-                            # ========== TAB 2: ÍNDICE DE RENTABILIDAD ==========
-                            dcc.Tab(
-                                label="Índice de Rentabilidad",
-                                style=tab_style,
-                                selected_style=tab_selected_style,
-                                children=[
-                                    dbc.Row(
-                                        style={"height": "100%", "margin": "0"},
-                                        children=[
-                                            # Columna FILTROS (width=2)
-                                            dbc.Col(
-                                                width=2,
-                                                style={
-                                                    "backgroundColor": "#ffffff",
-                                                    "padding": "1rem",
-                                                    "borderRadius": "5px",
-                                                    "maxHeight": "100%",
-                                                    "overflowY": "visible"
-                                                },
-                                                children=[
-                                                    html.H5("Filtros", style={"marginBottom": "1rem"}),
-
-                                                    html.Label("Rango de fechas:"),
-                                                    dcc.DatePickerRange(
-                                                        id="rango-fechas-rentabilidad",
-                                                        start_date=df_ventas["Fecha"].min(),
-                                                        end_date=df_ventas["Fecha"].max(),
-                                                        display_format="YYYY-MM-DD",
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-
-                                                    html.Label("Filtrar por categoría:"),
-                                                    dcc.Dropdown(
-                                                        id="filtro-categoria",
-                                                        options=[{"label": cat, "value": cat} 
-                                                                 for cat in df_ventas["Categoría"].unique()],
-                                                        value=df_ventas["Categoría"].unique(),
-                                                        multi=True,
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-
-                                                    html.Label("Filtrar por ciudad:"),
-                                                    dcc.Dropdown(
-                                                        id="filtro-ciudad-rentabilidad",
-                                                        options=[{"label": c, "value": c} 
-                                                                 for c in df_ventas["Ubicación"].unique()],
-                                                        value=df_ventas["Ubicación"].unique(),
-                                                        multi=True,
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-                                                    html.P(
-                                                        "Visualizamos la evolución a lo largo del tiempo "
-                                                        "para ver tendencias en la rentabilidad.",
-                                                        style={"fontSize": "80%", "color": "#666"}
-                                                    )
-                                                ]
-                                            ),
-
-                                            # Columna de GRÁFICA (width=10)
-                                            dbc.Col(
-                                                width=10,
-                                                style={"padding": "1rem", "overflowY": "auto", "height": "100%"},
-                                                children=[
-                                                    dcc.Graph(id="grafico-rentabilidad", style={"height": "100%"})
-                                                ]
-                                            )
-                                        ]
-                                    )
-                                ]
-                            ),
-
-                            # ========== TAB 3: SATISFACCIÓN DEL CLIENTE (SIN FECHAS) ==========
-                            dcc.Tab(
-                                label="Satisfacción del Cliente",
-                                style=tab_style,
-                                selected_style=tab_selected_style,
-                                children=[
-                                    dbc.Row(
-                                        style={"height": "100%", "margin": "0"},
-                                        children=[
-                                            # Filtros (width=2)
-                                            dbc.Col(
-                                                width=2,
-                                                style={
-                                                    "backgroundColor": "#ffffff",
-                                                    "padding": "1rem",
-                                                    "borderRadius": "5px",
-                                                    "maxHeight": "100%",
-                                                    "overflowY": "visible"
-                                                },
-                                                children=[
-                                                    html.H5("Filtros", style={"marginBottom": "1rem"}),
-
-                                                    html.Label("Tipo de análisis:"),
-                                                    dcc.RadioItems(
-                                                        id="tipo-analisis-satisfaccion",
-                                                        options=[
-                                                            {"label": "Comparar por eventos", "value": "comparar"},
-                                                            {"label": "Promedio general", "value": "general"}
-                                                        ],
-                                                        value="general",
-                                                        inline=True,
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-                                                    html.Label("Filtrar por evento:"),
-                                                    dcc.Dropdown(
-                                                        id="filtro-evento",
-                                                        options=[{"label": e, "value": e} 
-                                                                 for e in df_ventas["Evento"].unique()],
-                                                        value=df_ventas["Evento"].unique(),
-                                                        multi=True,
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-                                                    html.Label("Filtrar por ciudad:"),
-                                                    dcc.Dropdown(
-                                                        id="filtro-ciudad-satisfaccion",
-                                                        options=[{"label": c, "value": c} 
-                                                                 for c in df_ventas["Ubicación"].unique()],
-                                                        value=df_ventas["Ubicación"].unique(),
-                                                        multi=True,
-                                                        style={"marginBottom": "1rem"}
-                                                    ),
-                                                    html.Div(
-                                                        "Este gráfico muestra solo la calificación promedio "
-                                                        "por Evento y Ciudad, sin usar la fecha.",
-                                                        style={"fontSize": "80%", "color": "#666"}
-                                                    )
-                                                ]
-                                            ),
-                                            # Gráfica (width=10)
-                                            dbc.Col(
-                                                width=10,
-                                                style={"padding": "1rem", "overflowY": "auto"},
-                                                children=[
-                                                    dcc.Graph(id="grafico-satisfaccion", style={"height": "100%"})
-                                                ]
-                                            )
-                                        ]
-                                    )
-                                ]
-                            )
-                        ]
-                    ),
-                    width=12
-                )
-            ]
-        )
-    ]
-)
+# Se construye en cada carga de página para que las fechas y opciones
+# reflejen las filas incorporadas por la ingesta.
+def construir_layout():
+    fecha_min, fecha_max = fuente().rango_fechas()
+    ciudades = fuente().valores("Ubicación")
+    categorias = fuente().valores("Categoría")
+    eventos = fuente().valores("Evento")
+
+    return dbc.Container(
+        fluid=True,
+        style={
+            "height": "100vh",
+            "overflow": "hidden",  
+            "backgroundColor": "#f0f2f5",
+            "padding": "0"
+        },
+        children=[
+
+            # ENCABEZADO
+            dbc.Row(
+                style={"height": "60px", "backgroundColor": "white", "margin": "0.5rem"},
+                children=[
+                    dbc.Col(
+                        html.H1(
+                            "Dashboard de Métricas de Eventos",
+                            style={"textAlign": "center", "margin": "0.5rem"}
+                        ),
+                        width=12
+                    )
+                ],
+            ),
+
+            # Ancho de la ventana del navegador, para el presupuesto de puntos
+            dcc.Store(id="ancho-pantalla"),
+
+            # Id de esta página, con el que el pool reconoce peticiones superadas
+            dcc.Store(id="id-pagina", data=uuid.uuid4().hex),
+
+            # Resumen columnar para los callbacks del navegador (modo cliente)
+            dcc.Store(id="datos-cliente", data=paquete(fuente()) if MODO_CLIENTE else None),
+
+            # CONTENEDOR DE TABS (OCUPA EL RESTO DE LA ALTURA)
+            dbc.Row(
+                style={"height": "calc(100vh - 60px)", "margin": "0"},
+                children=[
+                    dbc.Col(
+                        dcc.Tabs(
+                            id="pestanas",
+                            value="conversion",
+                            style=tabs_styles,
+                            children=[
+
+                                # ========== TAB 1: TASA DE CONVERSIÓN ==========
+                                dcc.Tab(
+                                    label="Tasa de Conversión de Ventas",
+                                    value="conversion",
+                                    style=tab_style,
+                                    selected_style=tab_selected_style,
+                                    children=[
+                                        dbc.Row(
+                                            style={"height": "100%", "margin": "0"},
+                                            children=[
+                                                # Columna de FILTROS (width=2)
+                                                dbc.Col(
+                                                    width=2,
+                                                    style={
+                                                        "backgroundColor": "#ffffff",
+                                                        "padding": "1rem",
+                                                        "borderRadius": "5px",
+                                                        "maxHeight": "100%",
+                                                        "overflowY": "visible"
+                                                    },
+                                                    children=[
+                                                        html.H5("Filtros", style={"marginBottom": "1rem"}),
+
+                                                        html.P(
+                                                            "La tasa de conversión de ventas mide cuántas "
+                                                            "visualizaciones se convirtieron en ventas exitosas." + (
+                                                                "" if MODO_CLIENTE else
+                                                                " Las opciones de tiempo muestran cuánto duran "
+                                                                "esas visualizaciones: la mediana y el p90 por "
+                                                                "fecha, o su distribución por ciudad."
+                                                            ),
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+
+                                                        html.Label("Tipo de análisis:"),
+                                                        dcc.RadioItems(
+                                                            id="tipo-analisis-conversion",
+                                                            options=[
+                                                                {"label": "Mostrar todo", "value": "todo"},
+                                                                {"label": "Comparar por ciudades", "value": "comparar"}
+                                                            ] + (
+                                                                # Los bocetos de únicos y de cuantiles no viajan al navegador
+                                                                [] if MODO_CLIENTE else [
+                                                                    # Sin ID Usuario en las vistas no hay bocetos
+                                                                    {"label": "Por usuario único", "value": "unicos",
+                                                                     "disabled": not fuente().hay_unicos()},
+                                                                    {"label": "Tiempo de visualización (p50/p90)", "value": "tiempo"},
+                                                                    {"label": "Tiempo por ciudad (caja)", "value": "tiempo_caja"}
+                                                                ]
+                                                            ),
+                                                            value="todo",
+                                                            inline=True,
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+
+                                                        html.Label("Rango de fechas:"),
+                                                        dcc.DatePickerRange(
+                                                            id="rango-fechas-conversion",
+                                                            start_date=fecha_min,
+                                                            end_date=fecha_max,
+                                                            display_format="YYYY-MM-DD",
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+
+                                                        html.Label("Filtrar por ciudad:"),
+                                                        dcc.Dropdown(
+                                                            id="filtro-ciudad-conversion",
+                                                            options=[{"label": c, "value": c} 
+                                                                     for c in ciudades],
+                                                            value=ciudades,
+                                                            multi=True,
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+                                                    ]
+                                                ),
+
+                                                # Columna de GRÁFICA (width=10)
+                                                dbc.Col(
+                                                    width=10,
+                                                    style={"padding": "1rem", "overflowY": "auto"},
+                                                    children=[
+                                                        dcc.Graph(id="grafico-conversion", style={"height": "100%"})
+                                                    ]
+                                                )
+                                            ]
+                                        )
+                                    ]
+                                ),
+
+                                # ========== TAB 2: ÍNDICE DE RENTABILIDAD ==========
+                                dcc.Tab(
+                                    label="Índice de Rentabilidad",
+                                    value="rentabilidad",
+                                    style=tab_style,
+                                    selected_style=tab_selected_style,
+                                    children=[
+                                        dbc.Row(
+                                            style={"height": "100%", "margin": "0"},
+                                            children=[
+                                                # Columna FILTROS (width=2)
+                                                dbc.Col(
+                                                    width=2,
+                                                    style={
+                                                        "backgroundColor": "#ffffff",
+                                                        "padding": "1rem",
+                                                        "borderRadius": "5px",
+                                                        "maxHeight": "100%",
+                                                        "overflowY": "visible"
+                                                    },
+                                                    children=[
+                                                        html.H5("Filtros", style={"marginBottom": "1rem"}),
+
+                                                        html.Label("Rango de fechas:"),
+                                                        dcc.DatePickerRange(
+                                                            id="rango-fechas-rentabilidad",
+                                                            start_date=fecha_min,
+                                                            end_date=fecha_max,
+                                                            display_format="YYYY-MM-DD",
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+
+                                                        html.Label("Filtrar por categoría:"),
+                                                        dcc.Dropdown(
+                                                            id="filtro-categoria",
+                                                            options=[{"label": cat, "value": cat} 
+                                                                     for cat in categorias],
+                                                            value=categorias,
+                                                            multi=True,
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+
+                                                        html.Label("Filtrar por ciudad:"),
+                                                        dcc.Dropdown(
+                                                            id="filtro-ciudad-rentabilidad",
+                                                            options=[{"label": c, "value": c} 
+                                                                     for c in ciudades],
+                                                            value=ciudades,
+                                                            multi=True,
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+                                                        html.P(
+                                                            "Visualizamos la evolución a lo largo del tiempo "
+                                                            "para ver tendencias en la rentabilidad.",
+                                                            style={"fontSize": "80%", "color": "#666"}
+                                                        )
+                                                    ]
+                                                ),
+
+                                                # Columna de GRÁFICA (width=10)
+                                                dbc.Col(
+                                                    width=10,
+                                                    style={"padding": "1rem", "overflowY": "auto", "height": "100%"},
+                                                    children=[
+                                                        dcc.Graph(id="grafico-rentabilidad", style={"height": "100%"})
+                                                    ]
+                                                )
+                                            ]
+                                        )
+                                    ]
+                                ),
+
+                                # ========== TAB 3: SATISFACCIÓN DEL CLIENTE (SIN FECHAS) ==========
+                                dcc.Tab(
+                                    label="Satisfacción del Cliente",
+                                    value="satisfaccion",
+                                    style=tab_style,
+                                    selected_style=tab_selected_style,
+                                    children=[
+                                        dbc.Row(
+                                            style={"height": "100%", "margin": "0"},
+                                            children=[
+                                                # Filtros (width=2)
+                                                dbc.Col(
+                                                    width=2,
+                                                    style={
+                                                        "backgroundColor": "#ffffff",
+                                                        "padding": "1rem",
+                                                        "borderRadius": "5px",
+                                                        "maxHeight": "100%",
+                                                        "overflowY": "visible"
+                                                    },
+                                                    children=[
+                                                        html.H5("Filtros", style={"marginBottom": "1rem"}),
+
+                                                        html.Label("Tipo de análisis:"),
+                                                        dcc.RadioItems(
+                                                            id="tipo-analisis-satisfaccion",
+                                                            options=[
+                                                                {"label": "Comparar por eventos", "value": "comparar"},
+                                                                {"label": "Promedio general", "value": "general"}
+                                                            ] + (
+                                                                [] if MODO_CLIENTE else [
+                                                                    {"label": "Percentiles (p50/p90)", "value": "percentiles"},
+                                                                    {"label": "Distribución (caja)", "value": "caja"}
+                                                                ]
+                                                            ),
+                                                            value="general",
+                                                            inline=True,
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+                                                        html.Label("Filtrar por evento:"),
+                                                        dcc.Dropdown(
+                                                            id="filtro-evento",
+                                                            options=[{"label": e, "value": e} 
+                                                                     for e in eventos],
+                                                            value=eventos,
+                                                            multi=True,
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+                                                        html.Label("Filtrar por ciudad:"),
+                                                        dcc.Dropdown(
+                                                            id="filtro-ciudad-satisfaccion",
+                                                            options=[{"label": c, "value": c} 
+                                                                     for c in ciudades],
+                                                            value=ciudades,
+                                                            multi=True,
+                                                            style={"marginBottom": "1rem"}
+                                                        ),
+                                                        html.Div(
+                                                            "Este gráfico muestra solo la calificación (promedio "
+                                                            "o distribución) por Evento y Ciudad, sin usar la fecha.",
+                                                            style={"fontSize": "80%", "color": "#666"}
+                                                        )
+                                                    ]
+                                                ),
+                                                # Gráfica (width=10)
+                                                dbc.Col(
+                                                    width=10,
+                                                    style={"padding": "1rem", "overflowY": "auto"},
+                                                    children=[
+                                                        dcc.Graph(id="grafico-satisfaccion", style={"height": "100%"})
+                                                    ]
+                                                )
+                                            ]
+                                        )
+                                    ]
+                                )
+                            ]
+                        ),
+                        width=12
+                    )
+                ]
+            )
+        ]
+    )
+
+
+app.layout = construir_layout
 
 # --------------------------------------------------------------------
 # CALLBACKS
 # --------------------------------------------------------------------
+# Cada callback recibe además la pestaña activa y sólo calcula cuando su
+# pestaña es la visible; las figuras de las entradas por defecto se
+# precalculan al arrancar. En modo cliente los mismos cálculos corren en
+# assets/cliente.js y estos callbacks no se registran.
+
+# pestaña -> (función, número de Inputs, número de States)
+CALLBACKS_PESTANAS = {}
+# pestaña -> (versión de datos, entradas por defecto, {presupuesto: figura})
+figuras_por_defecto = {}
+# Figuras guardadas por pestaña; cada ancho distinto agrega una
+FIGURAS_POR_PESTANA = 8
+
+
+def _clave_entradas(args):
+    return json.dumps([normalizar(a) for a in args], default=str)
 
-@app.callback(
+
+def _clave_estados(estados):
+    """
+    Los States son sólo el ancho de pantalla, que llega tal como lo manda
+    el cliente: las figuras se guardan por el presupuesto de puntos que
+    resulta, igual para anchos que dan la misma figura.
+    """
+    return tuple(presupuesto_puntos(ancho) for ancho in estados)
+
+
+def servir_figura(pestana, args):
+    """La figura precalculada si las entradas son las por defecto; si no, la calcula."""
+    funcion, n_entradas, _ = CALLBACKS_PESTANAS[pestana]
+    guardada = figuras_por_defecto.get(pestana)
+    if guardada is not None:
+        version, clave, figuras = guardada
+        if version == json.dumps(version_datos(), default=str) and clave == _clave_entradas(args[:n_entradas]):
+            clave_estados = _clave_estados(args[n_entradas:])
+            figura = figuras.get(clave_estados)
+            if figura is None:
+                figura = funcion(*args)
+                # Se descarta la más vieja (nunca la precalculada, que es la primera)
+                while len(figuras) >= FIGURAS_POR_PESTANA:
+                    figuras.pop(list(figuras)[1], None)
+                figuras[clave_estados] = figura
+            return figura
+    return funcion(*args)
+
+
+def figura_caja(df, x, titulo, etiqueta):
+    """Diagrama de caja a partir de cuantiles ya calculados (columnas de CAJA)."""
+    fig = go.Figure(go.Box(
+        x=df[x],
+        lowerfence=df["Mínimo"],
+        q1=df["p25"],
+        median=df["p50"],
+        q3=df["p75"],
+        upperfence=df["Máximo"],
+        name=etiqueta,
+    ))
+    fig.update_layout(title=titulo, xaxis_title=x, yaxis_title=etiqueta)
+    return fig
+
+
+def callback_servidor(pestana, salida, *dependencias):
+    """Registra la función como callback de `pestana` y la devuelve sin cambios."""
+    def decorador(funcion):
+        if MODO_CLIENTE:
+            return funcion
+        CALLBACKS_PESTANAS[pestana] = (
+            funcion,
+            sum(isinstance(d, Input) for d in dependencias),
+            sum(isinstance(d, State) for d in dependencias),
+        )
+
+        # El id de la página sólo lo lee el pool (ver ejecucion.pagina_actual)
+        @functools.wraps(funcion)
+        def en_pestana(pestana_activa, *args):
+            if pestana_activa != pestana:
+                raise PreventUpdate
+            return servir_figura(pestana, args[:-1])
+
+        app.callback(salida, Input("pestanas", "value"), *dependencias, State("id-pagina", "data"))(en_pestana)
+        return funcion
+    return decorador
+
+
+@callback_servidor(
+    "conversion",
     Output("grafico-conversion", "figure"),
     Input("rango-fechas-conversion", "start_date"),
     Input("rango-fechas-conversion", "end_date"),
     Input("filtro-ciudad-conversion", "value"),
-    Input("tipo-analisis-conversion", "value")
+    Input("tipo-analisis-conversion", "value"),
+    State("ancho-pantalla", "data")
 )
-def actualizar_conversion(start_date, end_date, ciudades_seleccionadas, tipo_analisis):
-    df_ventas_filtrado = df_ventas[
-        (df_ventas["Fecha"] >= start_date) & (df_ventas["Fecha"] <= end_date)
-        & (df_ventas["Ubicación"].isin(ciudades_seleccionadas))
-    ]
-    df_vistas_filtrado = df_vistas[
-        (df_vistas["Fecha"] >= start_date) & (df_vistas["Fecha"] <= end_date)
-    ]
-
-    ventas_agrupadas = df_ventas_filtrado.groupby(["Fecha", "Ubicación"])["Entradas Vendidas"].sum().reset_index()
-    vistas_agrupadas = df_vistas_filtrado.groupby(["Fecha", "Ubicación"])["Tiempo de Visualización"].count().reset_index()
-
-    conversion = pd.merge(ventas_agrupadas, vistas_agrupadas, on=["Fecha", "Ubicación"], how="inner")
-    conversion["Tasa de Conversión"] = conversion["Entradas Vendidas"] / conversion["Tiempo de Visualización"]
-
-    if tipo_analisis == "comparar":
-        fig = px.line(
-            conversion,
-            x="Fecha",
-            y="Tasa de Conversión",
-            color="Ubicación",
-            title="Tasa de Conversión de Ventas por Ciudad",
-            labels={"Tasa de Conversión": "Tasa de Conversión"}
+@instrumentar("conversion")
+@en_segundo_plano("conversion")
+@memoizar("conversion")
+def actualizar_conversion(start_date, end_date, ciudades_seleccionadas, tipo_analisis, ancho_pantalla=None):
+    presupuesto = presupuesto_puntos(ancho_pantalla)
+    granularidad = elegir_granularidad(start_date, end_date, presupuesto)
+    sufijo = "" if granularidad == "D" else f" ({NOMBRES_GRANULARIDAD[granularidad]})"
+    if tipo_analisis == "unicos" and not fuente().hay_unicos():
+        # Opción deshabilitada en el layout; una página vieja aún puede pedirla
+        tipo_analisis = "todo"
+    if tipo_analisis not in ("unicos", "tiempo", "tiempo_caja"):
+        conversion = fuente().conversion(start_date, end_date, ciudades_seleccionadas, granularidad)
+
+    if tipo_analisis == "unicos":
+        # Entradas sobre usuarios distintos (bocetos HyperLogLog) de las ciudades elegidas
+        conversion_unicos = fuente().conversion_unicos(start_date, end_date, ciudades_seleccionadas, granularidad)
+        with etapa("reduccion", filas_entrada=len(conversion_unicos)) as e:
+            conversion_unicos = reducir_series(
+                conversion_unicos, "Fecha", "Tasa de Conversión", presupuesto=presupuesto
+            )
+            e.filas_salida = len(conversion_unicos)
+        with etapa("figura", filas_entrada=len(conversion_unicos)):
+            fig = px.line(
+                conversion_unicos,
+                x="Fecha",
+                y="Tasa de Conversión",
+                title="Tasa de Conversión por Usuario Único" + sufijo,
+                labels={"Tasa de Conversión": "Entradas por Usuario Único"},
+                render_mode=modo_render(conversion_unicos)
+            )
+    elif tipo_analisis == "tiempo":
+        # Mediana y p90 del tiempo de visualización (histogramas del cubo)
+        tiempo = fuente().cuantiles_tiempo(
+            start_date, end_date, ciudades_seleccionadas, PERCENTILES, granularidad=granularidad
         )
-    else:
-        conversion_total = conversion.groupby("Fecha").agg({
-            "Entradas Vendidas": "sum",
-            "Tiempo de Visualización": "sum"
-        }).reset_index()
-        conversion_total["Tasa de Conversión"] = (
-            conversion_total["Entradas Vendidas"] / conversion_total["Tiempo de Visualización"]
+        tiempo = tiempo.melt(
+            id_vars=["Fecha"], value_vars=list(PERCENTILES),
+            var_name="Percentil", value_name="Tiempo de Visualización"
         )
-        fig = px.line(
-            conversion_total,
-            x="Fecha",
-            y="Tasa de Conversión",
-            title="Tasa de Conversión de Ventas Total",
-            labels={"Tasa de Conversión": "Tasa de Conversión"}
+        with etapa("reduccion", filas_entrada=len(tiempo)) as e:
+            tiempo = reducir_series(tiempo, "Fecha", "Tiempo de Visualización", "Percentil", presupuesto)
+            e.filas_salida = len(tiempo)
+        with etapa("figura", filas_entrada=len(tiempo)):
+            fig = px.line(
+                tiempo,
+                x="Fecha",
+                y="Tiempo de Visualización",
+                color="Percentil",
+                title="Tiempo de Visualización (p50 y p90)" + sufijo,
+                render_mode=modo_render(tiempo)
+            )
+    elif tipo_analisis == "tiempo_caja":
+        tiempo = fuente().cuantiles_tiempo(
+            start_date, end_date, ciudades_seleccionadas, CAJA, por="Ubicación"
         )
+        with etapa("figura", filas_entrada=len(tiempo)):
+            fig = figura_caja(
+                tiempo, "Ubicación", "Distribución del Tiempo de Visualización por Ciudad", "Tiempo de Visualización"
+            )
+    elif tipo_analisis == "comparar":
+        with etapa("reduccion", filas_entrada=len(conversion)) as e:
+            conversion = reducir_series(conversion, "Fecha", "Tasa de Conversión", "Ubicación", presupuesto)
+            e.filas_salida = len(conversion)
+        with etapa("figura", filas_entrada=len(conversion)):
+            fig = px.line(
+                conversion,
+                x="Fecha",
+                y="Tasa de Conversión",
+                color="Ubicación",
+                title="Tasa de Conversión de Ventas por Ciudad" + sufijo,
+                labels={"Tasa de Conversión": "Tasa de Conversión"},
+                render_mode=modo_render(conversion)
+            )
+    else:
+        with etapa("groupby", filas_entrada=len(conversion)) as e:
+            conversion_total = conversion.groupby("Fecha").agg({
+                "Entradas Vendidas": "sum",
+                "Vistas": "sum"
+            }).reset_index()
+            conversion_total["Tasa de Conversión"] = (
+                conversion_total["Entradas Vendidas"] / conversion_total["Vistas"]
+            )
+            e.filas_salida = len(conversion_total)
+        with etapa("reduccion", filas_entrada=len(conversion_total)) as e:
+            conversion_total = reducir_series(conversion_total, "Fecha", "Tasa de Conversión", presupuesto=presupuesto)
+            e.filas_salida = len(conversion_total)
+        with etapa("figura", filas_entrada=len(conversion_total)):
+            fig = px.line(
+                conversion_total,
+                x="Fecha",
+                y="Tasa de Conversión",
+                title="Tasa de Conversión de Ventas Total" + sufijo,
+                labels={"Tasa de Conversión": "Tasa de Conversión"},
+                render_mode=modo_render(conversion_total)
+            )
 
     return fig
 
 # >>>>>> AÑADIR FECHAS AL CALLBACK DE RENTABILIDAD <<<<<<
-@app.callback(
+@callback_servidor(
+    "rentabilidad",
     Output("grafico-rentabilidad", "figure"),
     Input("rango-fechas-rentabilidad", "start_date"),
     Input("rango-fechas-rentabilidad", "end_date"),
     Input("filtro-categoria", "value"),
-    Input("filtro-ciudad-rentabilidad", "value")
+    Input("filtro-ciudad-rentabilidad", "value"),
+    State("ancho-pantalla", "data")
 )
-def actualizar_rentabilidad(start_date, end_date, categorias_seleccionadas, ciudades_seleccionadas):
-    # Filtramos por rango de fecha, categoría y ciudad
-    df_filtrado = df_ventas[
-        (df_ventas["Fecha"] >= start_date) & (df_ventas["Fecha"] <= end_date)
-        & (df_ventas["Categoría"].isin(categorias_seleccionadas))
-        & (df_ventas["Ubicación"].isin(ciudades_seleccionadas))
-    ]
-    df_filtrado["Margen Bruto"] = df_filtrado["Total"] - df_filtrado["Descuento"]
-    df_filtrado["Índice de Rentabilidad"] = df_filtrado["Margen Bruto"] / df_filtrado["Total"]
-
-    # Agrupamos por Fecha y Categoría
-    df_grouped = df_filtrado.groupby(["Fecha", "Categoría"])["Índice de Rentabilidad"].mean().reset_index()
-
-    fig = px.line(
-        df_grouped,
-        x="Fecha",
-        y="Índice de Rentabilidad",
-        color="Categoría",
-        title="Índice de Rentabilidad a lo largo del tiempo",
-        labels={"Índice de Rentabilidad": "Índice de Rentabilidad"}
+@instrumentar("rentabilidad")
+@en_segundo_plano("rentabilidad")
+@memoizar("rentabilidad")
+def actualizar_rentabilidad(start_date, end_date, categorias_seleccionadas, ciudades_seleccionadas,
+                            ancho_pantalla=None):
+    presupuesto = presupuesto_puntos(ancho_pantalla)
+    granularidad = elegir_granularidad(start_date, end_date, presupuesto)
+    sufijo = "" if granularidad == "D" else f" ({NOMBRES_GRANULARIDAD[granularidad]})"
+
+    # Índice promedio por Fecha y Categoría, resuelto desde el cubo o la base SQL
+    df_grouped = fuente().rentabilidad(
+        start_date, end_date, categorias_seleccionadas, ciudades_seleccionadas, granularidad
     )
+
+    with etapa("reduccion", filas_entrada=len(df_grouped)) as e:
+        df_grouped = reducir_series(df_grouped, "Fecha", "Índice de Rentabilidad", "Categoría", presupuesto)
+        e.filas_salida = len(df_grouped)
+    with etapa("figura", filas_entrada=len(df_grouped)):
+        fig = px.line(
+            df_grouped,
+            x="Fecha",
+            y="Índice de Rentabilidad",
+            color="Categoría",
+            title="Índice de Rentabilidad a lo largo del tiempo" + sufijo,
+            labels={"Índice de Rentabilidad": "Índice de Rentabilidad"},
+            render_mode=modo_render(df_grouped)
+        )
     return fig
 
-@app.callback(
+@callback_servidor(
+    "satisfaccion",
     Output("grafico-satisfaccion", "figure"),
     Input("filtro-evento", "value"),
     Input("filtro-ciudad-satisfaccion", "value"),
     Input("tipo-analisis-satisfaccion", "value")
 )
+@instrumentar("satisfaccion")
+@en_segundo_plano("satisfaccion")
+@memoizar("satisfaccion")
 def actualizar_satisfaccion(eventos_seleccionados, ciudades_seleccionadas, tipo_analisis):
     """
     Queremos ver la satisfacción: SÓLO 'Evento' y 'Ciudad'
     - 'comparar': agrupar por [Evento, Ubicación]
     - 'general': agrupar solo por [Evento]
+    - 'percentiles' / 'caja': cuantiles por [Evento] desde los histogramas
     """
-    df_filtrado = df_ventas[
-        (df_ventas["Evento"].isin(eventos_seleccionados))
-        & (df_ventas["Ubicación"].isin(ciudades_seleccionadas))
-    ]
-    df_filtrado["Satisfacción"] = pd.to_numeric(df_filtrado["Satisfacción"], errors="coerce")
-    df_filtrado = df_filtrado.dropna(subset=["Satisfacción"])
-
-    if tipo_analisis == "comparar":
-        df_grouped = df_filtrado.groupby(["Evento", "Ubicación"])["Satisfacción"].mean().reset_index()
-        fig = px.bar(
-            df_grouped,
-            x="Evento",
-            y="Satisfacción",
-            color="Ubicación",
-            barmode="group",
-            title="Satisfacción Promedio por Evento y Ciudad",
-            labels={"Satisfacción": "Promedio de Satisfacción"}
+    if tipo_analisis == "percentiles":
+        df_grouped = fuente().cuantiles_satisfaccion(eventos_seleccionados, ciudades_seleccionadas, PERCENTILES)
+        df_grouped = df_grouped.melt(
+            id_vars=["Evento"], value_vars=list(PERCENTILES), var_name="Percentil", value_name="Satisfacción"
         )
+        with etapa("figura", filas_entrada=len(df_grouped)):
+            fig = px.bar(
+                df_grouped,
+                x="Evento",
+                y="Satisfacción",
+                color="Percentil",
+                barmode="group",
+                title="Mediana y Percentil 90 de Satisfacción por Evento"
+            )
+    elif tipo_analisis == "caja":
+        df_grouped = fuente().cuantiles_satisfaccion(eventos_seleccionados, ciudades_seleccionadas, CAJA)
+        with etapa("figura", filas_entrada=len(df_grouped)):
+            fig = figura_caja(df_grouped, "Evento", "Distribución de Satisfacción por Evento", "Satisfacción")
+    elif tipo_analisis == "comparar":
+        df_grouped = fuente().satisfaccion(eventos_seleccionados, ciudades_seleccionadas, por_ciudad=True)
+        with etapa("figura", filas_entrada=len(df_grouped)):
+            fig = px.bar(
+                df_grouped,
+                x="Evento",
+                y="Satisfacción",
+                color="Ubicación",
+                barmode="group",
+                title="Satisfacción Promedio por Evento y Ciudad",
+                labels={"Satisfacción": "Promedio de Satisfacción"}
+            )
     else:
-        df_grouped = df_filtrado.groupby("Evento")["Satisfacción"].mean().reset_index()
-        fig = px.bar(
-            df_grouped,
-            x="Evento",
-            y="Satisfacción",
-            title="Satisfacción Promedio General por Evento",
-            labels={"Satisfacción": "Promedio de Satisfacción"}
-        )
+        df_grouped = fuente().satisfaccion(eventos_seleccionados, ciudades_seleccionadas, por_ciudad=False)
+        with etapa("figura", filas_entrada=len(df_grouped)):
+            fig = px.bar(
+                df_grouped,
+                x="Evento",
+                y="Satisfacción",
+                title="Satisfacción Promedio General por Evento",
+                labels={"Satisfacción": "Promedio de Satisfacción"}
+            )
 
     fig.update_yaxes(range=[1, 5])
     return fig
 
+if MODO_CLIENTE:
+    app.clientside_callback(
+        ClientsideFunction("dash_eventos", "conversion"),
+        Output("grafico-conversion", "figure"),
+        Input("rango-fechas-conversion", "start_date"),
+        Input("rango-fechas-conversion", "end_date"),
+        Input("filtro-ciudad-conversion", "value"),
+        Input("tipo-analisis-conversion", "value"),
+        State("ancho-pantalla", "data"),
+        State("datos-cliente", "data")
+    )
+    app.clientside_callback(
+        ClientsideFunction("dash_eventos", "rentabilidad"),
+        Output("grafico-rentabilidad", "figure"),
+        Input("rango-fechas-rentabilidad", "start_date"),
+        Input("rango-fechas-rentabilidad", "end_date"),
+        Input("filtro-categoria", "value"),
+        Input("filtro-ciudad-rentabilidad", "value"),
+        State("ancho-pantalla", "data"),
+        State("datos-cliente", "data")
+    )
+    app.clientside_callback(
+        ClientsideFunction("dash_eventos", "satisfaccion"),
+        Output("grafico-satisfaccion", "figure"),
+        Input("filtro-evento", "value"),
+        Input("filtro-ciudad-satisfaccion", "value"),
+        Input("tipo-analisis-satisfaccion", "value"),
+        State("datos-cliente", "data")
+    )
+
+# El ancho se redondea a 200 px para no fragmentar la cache de figuras
+app.clientside_callback(
+    "function(_) { return Math.round(window.innerWidth / 200) * 200; }",
+    Output("ancho-pantalla", "data"),
+    Input("ancho-pantalla", "id")
+)
+
+# --------------------------------------------------------------------
+# FIGURAS POR DEFECTO
+# --------------------------------------------------------------------
+def entradas_por_defecto():
+    """Entradas con que cada pestaña pide su figura al cargar la página (ver construir_layout)."""
+    # Sin filas el layout deja las fechas vacías y el navegador manda None
+    inicio, fin = (None if fecha is None else fecha.isoformat() for fecha in fuente().rango_fechas())
+    ciudades = fuente().valores("Ubicación")
+    return {
+        "conversion": (inicio, fin, ciudades, "todo"),
+        "rentabilidad": (inicio, fin, fuente().valores("Categoría"), ciudades),
+        "satisfaccion": (fuente().valores("Evento"), ciudades, "general"),
+    }
+
+
+def precalcular_figuras():
+    """Figura de cada pestaña con las entradas por defecto (el ancho aún no se conoce)."""
+    if not CALLBACKS_PESTANAS:
+        return
+    version = json.dumps(version_datos(), default=str)
+    for pestana, entradas in entradas_por_defecto().items():
+        funcion, _, n_estados = CALLBACKS_PESTANAS[pestana]
+        estados = (None,) * n_estados
+        figuras_por_defecto[pestana] = (
+            version, _clave_entradas(entradas), {_clave_estados(estados): funcion(*entradas, *estados)}
+        )
+
+
+with etapa("figuras_por_defecto", callback="arranque"):
+    precalcular_figuras()
+
 # --------------------------------------------------------------------
 # MAIN
 # --------------------------------------------------------------------
@@ -0,0 +1,402 @@
+// --------------------------------------------------------------------
+// MODO CLIENTE: CALLBACKS EN EL NAVEGADOR
+// --------------------------------------------------------------------
+// Con DASH_EVENTOS_CLIENTE=1 el layout trae el resumen de cliente.py en
+// el Store "datos-cliente" y estas funciones hacen lo mismo que los
+// callbacks de app.py (filtrar, agrupar, reducir puntos y armar la
+// figura) sin pedir nada al servidor.
+
+(function () {
+    var MS_DIA = 86400000;
+
+    // ----------------------------------------------------------------
+    // FECHAS (días desde 1970-01-01, como en columnar.py)
+    // ----------------------------------------------------------------
+    function milisegundos(fecha) {
+        var texto = fecha.length > 10 ? fecha.slice(0, 19) : fecha + "T00:00:00";
+        return Date.parse(texto + "Z");
+    }
+
+    // Como dia_inicial / dia_final: Fecha >= inicio y Fecha <= fin
+    function diaInicial(fecha) {
+        return fecha ? Math.ceil(milisegundos(fecha) / MS_DIA) : -Infinity;
+    }
+
+    function diaFinal(fecha) {
+        return fecha ? Math.floor(milisegundos(fecha) / MS_DIA) : Infinity;
+    }
+
+    function textoFecha(dia) {
+        return new Date(dia * MS_DIA).toISOString().slice(0, 10);
+    }
+
+    // ----------------------------------------------------------------
+    // REDUCCIÓN (mismas reglas que reduccion.py)
+    // ----------------------------------------------------------------
+    function presupuestoPuntos(ancho, p) {
+        ancho = Math.min(Number(ancho) || p.ancho_defecto, p.ancho_maximo);
+        return Math.max(p.puntos_minimos, Math.floor(ancho * p.fraccion_grafico));
+    }
+
+    function elegirGranularidad(inicio, fin, presupuesto, p) {
+        if (!inicio || !fin) {
+            return "D";
+        }
+        var dias = Math.floor((milisegundos(fin) - milisegundos(inicio)) / MS_DIA) + 1;
+        if (dias <= p.factor_lttb * presupuesto) {
+            return "D";
+        }
+        if (dias / 7 <= p.factor_lttb * presupuesto) {
+            return "W";
+        }
+        return "M";
+    }
+
+    var NOMBRES_GRANULARIDAD = {D: "diaria", W: "semanal", M: "mensual"};
+
+    function sufijo(granularidad) {
+        return granularidad === "D" ? "" : " (" + NOMBRES_GRANULARIDAD[granularidad] + ")";
+    }
+
+    function truncar(dia, granularidad) {
+        if (granularidad === "W") {
+            // 1970-01-01 fue jueves: se retrocede al lunes anterior
+            return dia - (((dia + 3) % 7) + 7) % 7;
+        }
+        if (granularidad === "M") {
+            var fecha = new Date(dia * MS_DIA);
+            return Math.round(Date.UTC(fecha.getUTCFullYear(), fecha.getUTCMonth(), 1) / MS_DIA);
+        }
+        return dia;
+    }
+
+    function finito(valor) {
+        if (isNaN(valor)) {
+            return 0;
+        }
+        return Math.max(-Number.MAX_VALUE, Math.min(Number.MAX_VALUE, valor));
+    }
+
+    function promedio(valores, inicio, fin) {
+        var suma = 0;
+        for (var i = inicio; i < fin; i++) {
+            suma += valores[i];
+        }
+        return suma / (fin - inicio);
+    }
+
+    // Índices de los `umbral` puntos que elige Largest-Triangle-Three-Buckets
+    function lttb(x, y, umbral) {
+        var n = x.length;
+        var i;
+        if (umbral >= n || umbral < 3) {
+            var todos = [];
+            for (i = 0; i < n; i++) {
+                todos.push(i);
+            }
+            return todos;
+        }
+        y = y.map(finito);
+        // Límites de los umbral-2 baldes interiores (como np.linspace)
+        var paso = (n - 2) / (umbral - 2);
+        var limites = [];
+        for (i = 0; i < umbral - 1; i++) {
+            limites.push(i === umbral - 2 ? n - 1 : Math.floor(i * paso + 1));
+        }
+        var indices = [0];
+        var anterior = 0;
+        for (i = 0; i < umbral - 2; i++) {
+            var inicio = limites[i], fin = limites[i + 1];
+            var siguienteFin = i + 2 < limites.length ? limites[i + 2] : n;
+            var xProm = promedio(x, fin, siguienteFin);
+            var yProm = promedio(y, fin, siguienteFin);
+            var mejor = inicio, mayor = -1;
+            for (var k = inicio; k < fin; k++) {
+                var area = Math.abs(
+                    (x[anterior] - xProm) * (y[k] - y[anterior])
+                    - (x[anterior] - x[k]) * (yProm - y[anterior])
+                );
+                if (area > mayor) {
+                    mayor = area;
+                    mejor = k;
+                }
+            }
+            anterior = mejor;
+            indices.push(mejor);
+        }
+        indices.push(n - 1);
+        return indices;
+    }
+
+    function reducirSeries(series, presupuesto) {
+        var largas = series.some(function (s) { return s.dias.length > presupuesto; });
+        if (!largas) {
+            return series;
+        }
+        return series.map(function (s) {
+            var indices = lttb(s.dias, s.y, presupuesto);
+            return {
+                nombre: s.nombre,
+                dias: indices.map(function (i) { return s.dias[i]; }),
+                y: indices.map(function (i) { return s.y[i]; })
+            };
+        });
+    }
+
+    // ----------------------------------------------------------------
+    // FILTRADO Y AGRUPACIÓN
+    // ----------------------------------------------------------------
+    // Tabla de bits por código, como IndiceFiltro._calcular_bits
+    function bits(diccionario, seleccion) {
+        var elegidos = new Uint8Array(diccionario.length);
+        var posiciones = {};
+        diccionario.forEach(function (valor, i) { posiciones[valor] = i; });
+        (seleccion || []).forEach(function (valor) {
+            if (valor in posiciones) {
+                elegidos[posiciones[valor]] = 1;
+            }
+        });
+        return elegidos;
+    }
+
+    function acumular(mapa, clave, valores) {
+        var actual = mapa.get(clave);
+        if (actual === undefined) {
+            mapa.set(clave, valores.slice());
+        } else {
+            for (var i = 0; i < valores.length; i++) {
+                actual[i] += valores[i];
+            }
+        }
+    }
+
+    // Filas {periodo, codigo, valores} ordenadas por periodo y código
+    function filasOrdenadas(mapa, nCodigos) {
+        var filas = [];
+        mapa.forEach(function (valores, clave) {
+            var periodo = Math.floor(clave / nCodigos);
+            filas.push({periodo: periodo, codigo: clave - periodo * nCodigos, valores: valores});
+        });
+        filas.sort(function (a, b) { return a.periodo - b.periodo || a.codigo - b.codigo; });
+        return filas;
+    }
+
+    // Una serie por código, en orden de aparición (como plotly express)
+    function separarSeries(filas, diccionario, valor) {
+        var series = [];
+        var porCodigo = {};
+        filas.forEach(function (fila) {
+            var serie = porCodigo[fila.codigo];
+            if (serie === undefined) {
+                serie = porCodigo[fila.codigo] = {nombre: diccionario[fila.codigo], dias: [], y: []};
+                series.push(serie);
+            }
+            serie.dias.push(fila.periodo);
+            serie.y.push(valor(fila.valores));
+        });
+        return series;
+    }
+
+    function conversion(datos, inicio, fin, ciudades, granularidad) {
+        var ventas = datos.ventas, vistas = datos.vistas;
+        var nCodigos = datos.ubicaciones.length;
+        var enCiudad = bits(datos.ubicaciones, ciudades);
+        var desde = diaInicial(inicio), hasta = diaFinal(fin);
+        var i, dia, codigo;
+
+        var entradas = new Map();
+        for (i = 0; i < ventas.dia.length; i++) {
+            dia = ventas.dia[i];
+            codigo = ventas.ubicacion[i];
+            if (dia >= desde && dia <= hasta && codigo >= 0 && enCiudad[codigo]) {
+                acumular(entradas, truncar(dia, granularidad) * nCodigos + codigo, [ventas.entradas[i]]);
+            }
+        }
+        var totalVistas = new Map();
+        for (i = 0; i < vistas.dia.length; i++) {
+            dia = vistas.dia[i];
+            codigo = vistas.ubicacion[i];
+            if (dia >= desde && dia <= hasta && codigo >= 0) {
+                acumular(totalVistas, truncar(dia, granularidad) * nCodigos + codigo, [vistas.vistas[i]]);
+            }
+        }
+        // Merge interno por Fecha y Ubicación
+        var unidas = new Map();
+        entradas.forEach(function (valores, clave) {
+            var vistasGrupo = totalVistas.get(clave);
+            if (vistasGrupo !== undefined) {
+                unidas.set(clave, [valores[0], vistasGrupo[0]]);
+            }
+        });
+        return filasOrdenadas(unidas, nCodigos);
+    }
+
+    function rentabilidad(datos, inicio, fin, categorias, ciudades, granularidad) {
+        var ventas = datos.ventas;
+        var nCodigos = datos.categorias.length;
+        var enCategoria = bits(datos.categorias, categorias);
+        var enCiudad = bits(datos.ubicaciones, ciudades);
+        var desde = diaInicial(inicio), hasta = diaFinal(fin);
+
+        var grupos = new Map();
+        for (var i = 0; i < ventas.dia.length; i++) {
+            var dia = ventas.dia[i];
+            var categoria = ventas.categoria[i], ciudad = ventas.ubicacion[i];
+            if (dia >= desde && dia <= hasta && categoria >= 0 && enCategoria[categoria]
+                && ciudad >= 0 && enCiudad[ciudad]) {
+                acumular(
+                    grupos, truncar(dia, granularidad) * nCodigos + categoria,
+                    [ventas.suma_indice[i], ventas.conteo_indice[i]]
+                );
+            }
+        }
+        return filasOrdenadas(grupos, nCodigos);
+    }
+
+    function satisfaccion(datos, eventos, ciudades, porCiudad) {
+        var tabla = datos.satisfaccion;
+        var nCiudades = datos.ubicaciones.length;
+        var enEvento = bits(datos.eventos, eventos);
+        var enCiudad = bits(datos.ubicaciones, ciudades);
+
+        var grupos = new Map();
+        for (var i = 0; i < tabla.evento.length; i++) {
+            var evento = tabla.evento[i], ciudad = tabla.ubicacion[i];
+            if (evento >= 0 && enEvento[evento] && ciudad >= 0 && enCiudad[ciudad]) {
+                var clave = porCiudad ? evento * nCiudades + ciudad : evento * nCiudades;
+                acumular(grupos, clave, [tabla.suma[i], tabla.conteo[i]]);
+            }
+        }
+        // Aquí el "periodo" es el código del evento
+        return filasOrdenadas(grupos, nCiudades).filter(function (fila) { return fila.valores[1] > 0; });
+    }
+
+    // ----------------------------------------------------------------
+    // FIGURAS
+    // ----------------------------------------------------------------
+    function figura(trazas, datos, layout) {
+        layout.template = datos.plantilla;
+        layout.margin = {t: 60};
+        return {data: trazas, layout: layout};
+    }
+
+    function figuraLineas(datos, series, titulo, etiquetaY, etiquetaColor) {
+        var puntos = series.reduce(function (total, s) { return total + s.dias.length; }, 0);
+        // render_mode="auto" de plotly express ya pasa a WebGL con más de 1000 filas
+        var tipo = puntos > Math.min(1000, datos.parametros.puntos_webgl) ? "scattergl" : "scatter";
+        var prefijo = etiquetaColor ? etiquetaColor + "=" : "";
+        var trazas = series.map(function (s) {
+            return {
+                type: tipo,
+                mode: "lines",
+                name: s.nombre,
+                legendgroup: s.nombre,
+                showlegend: Boolean(etiquetaColor),
+                x: s.dias.map(textoFecha),
+                y: s.y,
+                hovertemplate: (etiquetaColor ? prefijo + s.nombre + "<br>" : "")
+                    + "Fecha=%{x}<br>" + etiquetaY + "=%{y}<extra></extra>"
+            };
+        });
+        return figura(trazas, datos, {
+            title: {text: titulo},
+            xaxis: {title: {text: "Fecha"}},
+            yaxis: {title: {text: etiquetaY}},
+            legend: {title: {text: etiquetaColor || ""}, tracegroupgap: 0}
+        });
+    }
+
+    function tasa(valores) {
+        return valores[0] / valores[1];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dash_eventos: {
+            conversion: function (inicio, fin, ciudades, tipoAnalisis, ancho, datos) {
+                var p = datos.parametros;
+                var presupuesto = presupuestoPuntos(ancho, p);
+                var granularidad = elegirGranularidad(inicio, fin, presupuesto, p);
+                var filas = conversion(datos, inicio, fin, ciudades, granularidad);
+
+                if (tipoAnalisis === "comparar") {
+                    var series = separarSeries(filas, datos.ubicaciones, tasa);
+                    return figuraLineas(
+                        datos, reducirSeries(series, presupuesto),
+                        "Tasa de Conversión de Ventas por Ciudad" + sufijo(granularidad),
+                        "Tasa de Conversión", "Ubicación"
+                    );
+                }
+                // Total de todas las ciudades por Fecha
+                var porFecha = new Map();
+                filas.forEach(function (fila) { acumular(porFecha, fila.periodo, fila.valores); });
+                var total = separarSeries(filasOrdenadas(porFecha, 1), [""], tasa);
+                if (!total.length) {
+                    // Como plotly express: una traza vacía en lugar de ninguna
+                    total = [{nombre: "", dias: [], y: []}];
+                }
+                return figuraLineas(
+                    datos, reducirSeries(total, presupuesto),
+                    "Tasa de Conversión de Ventas Total" + sufijo(granularidad),
+                    "Tasa de Conversión", null
+                );
+            },
+
+            rentabilidad: function (inicio, fin, categorias, ciudades, ancho, datos) {
+                var p = datos.parametros;
+                var presupuesto = presupuestoPuntos(ancho, p);
+                var granularidad = elegirGranularidad(inicio, fin, presupuesto, p);
+                var filas = rentabilidad(datos, inicio, fin, categorias, ciudades, granularidad);
+                var series = separarSeries(filas, datos.categorias, tasa);
+                return figuraLineas(
+                    datos, reducirSeries(series, presupuesto),
+                    "Índice de Rentabilidad a lo largo del tiempo" + sufijo(granularidad),
+                    "Índice de Rentabilidad", "Categoría"
+                );
+            },
+
+            satisfaccion: function (eventos, ciudades, tipoAnalisis, datos) {
+                var porCiudad = tipoAnalisis === "comparar";
+                var filas = satisfaccion(datos, eventos, ciudades, porCiudad);
+                var trazas;
+                if (porCiudad) {
+                    // Una traza de barras por ciudad, en orden de aparición
+                    trazas = [];
+                    var porCiudadTraza = {};
+                    filas.forEach(function (fila) {
+                        var ciudad = datos.ubicaciones[fila.codigo];
+                        var traza = porCiudadTraza[ciudad];
+                        if (traza === undefined) {
+                            traza = porCiudadTraza[ciudad] = {
+                                type: "bar", name: ciudad, legendgroup: ciudad, offsetgroup: ciudad,
+                                showlegend: true, x: [], y: [],
+                                hovertemplate: "Ubicación=" + ciudad
+                                    + "<br>Evento=%{x}<br>Promedio de Satisfacción=%{y}<extra></extra>"
+                            };
+                            trazas.push(traza);
+                        }
+                        traza.x.push(datos.eventos[fila.periodo]);
+                        traza.y.push(tasa(fila.valores));
+                    });
+                } else {
+                    trazas = [{
+                        type: "bar", name: "", showlegend: false,
+                        x: filas.map(function (fila) { return datos.eventos[fila.periodo]; }),
+                        y: filas.map(function (fila) { return tasa(fila.valores); }),
+                        hovertemplate: "Evento=%{x}<br>Promedio de Satisfacción=%{y}<extra></extra>"
+                    }];
+                }
+                return figura(trazas, datos, {
+                    title: {
+                        text: porCiudad
+                            ? "Satisfacción Promedio por Evento y Ciudad"
+                            : "Satisfacción Promedio General por Evento"
+                    },
+                    xaxis: {title: {text: "Evento"}},
+                    yaxis: {title: {text: "Promedio de Satisfacción"}, range: [1, 5]},
+                    legend: {title: {text: porCiudad ? "Ubicación" : ""}, tracegroupgap: 0},
+                    barmode: porCiudad ? "group" : "relative"
+                });
+            }
+        }
+    });
+})();
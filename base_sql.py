@@ -0,0 +1,404 @@
+import fcntl
+import json
+import os
+import queue
+import sqlite3
+from contextlib import closing, contextmanager
+
+import pandas as pd
+
+from columnar import dia_final, dia_inicial, dias_a_fechas
+from cuantiles import cubetas, cuantiles
+from metricas import etapa
+
+# --------------------------------------------------------------------
+# BACKEND SQL EMBEBIDO (SQLite)
+# --------------------------------------------------------------------
+# Alternativa al cubo en memoria: ventas y vistas se cargan una vez en un
+# archivo SQLite con índices por Fecha, Ubicación, Categoría y Evento, y
+# cada callback resuelve filtro + groupby + merge con una sola consulta.
+# Todos los workers leen el mismo archivo (en modo sólo lectura, desde un
+# pool de conexiones) en lugar de parsear los CSV cada uno. Los
+# histogramas de cuantiles (ver cuantiles.py) se guardan ya agregados en
+# sus propias tablas, y el rango de fechas y los valores de los dropdowns
+# en `meta`, para no recorrer ventas en cada carga de página.
+
+# Cambia cuando cambia el esquema, para no reutilizar bases viejas
+VERSION_ESQUEMA = 3
+
+ESQUEMA_SQL = """
+CREATE TABLE ventas (
+    fecha TEXT, evento TEXT, categoria TEXT, entradas INTEGER,
+    ubicacion TEXT, satisfaccion REAL, total REAL, descuento REAL, cubeta_satisfaccion INTEGER
+);
+CREATE TABLE vistas (fecha TEXT, id_usuario TEXT, tiempo REAL, ubicacion TEXT, cubeta_tiempo INTEGER);
+CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT);
+"""
+
+CUBETAS_SQL = """
+CREATE TABLE cubetas_satisfaccion AS
+    SELECT evento, ubicacion, cubeta_satisfaccion AS cubeta, COUNT(*) AS conteo
+    FROM ventas WHERE cubeta_satisfaccion IS NOT NULL
+    GROUP BY 1, 2, 3;
+CREATE TABLE cubetas_tiempo AS
+    SELECT fecha, ubicacion, cubeta_tiempo AS cubeta, COUNT(*) AS conteo
+    FROM vistas WHERE cubeta_tiempo IS NOT NULL
+    GROUP BY 1, 2, 3;
+"""
+
+INDICES_SQL = """
+CREATE INDEX ventas_fecha ON ventas (fecha, ubicacion);
+CREATE INDEX ventas_ubicacion ON ventas (ubicacion, fecha);
+CREATE INDEX ventas_categoria ON ventas (categoria, fecha);
+CREATE INDEX ventas_evento ON ventas (evento, ubicacion);
+CREATE INDEX vistas_fecha ON vistas (fecha, ubicacion);
+CREATE INDEX cubetas_satisfaccion_evento ON cubetas_satisfaccion (evento, ubicacion);
+CREATE INDEX cubetas_tiempo_fecha ON cubetas_tiempo (fecha, ubicacion);
+ANALYZE;
+"""
+
+COLUMNAS_VENTAS = {
+    "Fecha": "fecha", "Evento": "evento", "Categoría": "categoria", "Entradas Vendidas": "entradas",
+    "Ubicación": "ubicacion", "Satisfacción": "satisfaccion", "Total": "total", "Descuento": "descuento",
+}
+COLUMNAS_VISTAS = {
+    "Fecha": "fecha", "ID Usuario": "id_usuario", "Tiempo de Visualización": "tiempo", "Ubicación": "ubicacion",
+}
+
+# Inicio del período de cada fecha ISO según la granularidad
+EXPRESION_PERIODO = {
+    "D": "fecha",
+    "W": "date(fecha, '-' || ((CAST(strftime('%w', fecha) AS INTEGER) + 6) % 7) || ' days')",
+    "M": "strftime('%Y-%m-01', fecha)",
+}
+
+
+# Columnas con dropdown en el layout (valores distintos guardados en meta)
+COLUMNAS_CONTROLES = ["Ubicación", "Categoría", "Evento"]
+
+
+def _fecha_iso(dias):
+    return str(dias_a_fechas([dias])[0])[:10]
+
+
+def _insertar(con, tabla, columnas, bloques):
+    for bloque in bloques:
+        bloque = bloque[list(columnas)].rename(columns=columnas)
+        bloque["fecha"] = pd.to_datetime(bloque["fecha"]).dt.strftime("%Y-%m-%d")
+        for col in ("satisfaccion", "total", "descuento", "tiempo"):
+            if col in bloque:
+                bloque[col] = pd.to_numeric(bloque[col], errors="coerce")
+        for col in ("satisfaccion", "tiempo"):
+            if col in bloque:
+                bloque["cubeta_" + col] = cubetas(bloque[col])
+        bloque.to_sql(tabla, con, if_exists="append", index=False)
+
+
+def _controles(con):
+    """Rango de fechas y valores distintos de cada dropdown, para guardar en meta."""
+    minimo, maximo = con.execute("SELECT MIN(fecha), MAX(fecha) FROM ventas").fetchone()
+    valores = {}
+    for columna in COLUMNAS_CONTROLES:
+        col = COLUMNAS_VENTAS[columna]
+        filas = con.execute(f"SELECT DISTINCT {col} FROM ventas WHERE {col} IS NOT NULL ORDER BY 1")
+        valores[columna] = [fila[0] for fila in filas]
+    return {"rango_fechas": [minimo, maximo], "valores": valores}
+
+
+def construir_base(ruta, firma, bloques_ventas, bloques_vistas):
+    """
+    Crea (o reutiliza si `firma` coincide) la base en `ruta`. Un candado
+    de archivo evita que dos workers la construyan a la vez.
+    """
+    firma = {"esquema": VERSION_ESQUEMA, "fuentes": firma}
+    with open(ruta + ".candado", "w") as candado:
+        fcntl.flock(candado, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(ruta):
+                with closing(sqlite3.connect(ruta)) as con:
+                    fila = con.execute("SELECT valor FROM meta WHERE clave = 'firma'").fetchone()
+                if fila and json.loads(fila[0]) == firma:
+                    return False
+
+            temporal = ruta + ".tmp"
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            con = sqlite3.connect(temporal)
+            con.execute("PRAGMA journal_mode=OFF")
+            con.execute("PRAGMA synchronous=OFF")
+            con.executescript(ESQUEMA_SQL)
+            _insertar(con, "ventas", COLUMNAS_VENTAS, bloques_ventas)
+            _insertar(con, "vistas", COLUMNAS_VISTAS, bloques_vistas)
+            con.executescript(CUBETAS_SQL)
+            con.executescript(INDICES_SQL)
+            con.execute("INSERT INTO meta VALUES ('controles', ?)", (json.dumps(_controles(con)),))
+            con.execute("INSERT INTO meta VALUES ('firma', ?)", (json.dumps(firma),))
+            con.commit()
+            con.close()
+            os.replace(temporal, ruta)
+            return True
+        finally:
+            fcntl.flock(candado, fcntl.LOCK_UN)
+
+
+class PoolConexiones:
+    """Conexiones de sólo lectura reutilizadas entre peticiones."""
+
+    def __init__(self, ruta, tamano=4):
+        self.ruta = ruta
+        self._libres = queue.LifoQueue()
+        for _ in range(tamano):
+            self._libres.put(self._abrir())
+
+    def _abrir(self):
+        con = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True, check_same_thread=False)
+        con.execute("PRAGMA query_only=ON")
+        con.execute("PRAGMA mmap_size=268435456")
+        return con
+
+    @contextmanager
+    def conexion(self):
+        con = self._libres.get()
+        try:
+            yield con
+        finally:
+            self._libres.put(con)
+
+    def leer(self, sql, parametros=()):
+        with self.conexion() as con:
+            return pd.read_sql_query(sql, con, params=list(parametros))
+
+    def dedicada(self):
+        """Conexión fuera del pool, para lecturas largas que no deben ocupar una del pool."""
+        return closing(self._abrir())
+
+
+def _lista(valores):
+    valores = list(valores or [])
+    return ", ".join("?" * len(valores)), valores
+
+
+class BaseSQL:
+    """Responde las mismas consultas que `CuboDiario` con SQL sobre SQLite."""
+
+    def __init__(self, ruta, tamano_pool=4):
+        self.pool = PoolConexiones(ruta, tamano_pool)
+        with self.pool.conexion() as con:
+            meta = dict(con.execute("SELECT clave, valor FROM meta"))
+        self.controles = json.loads(meta["controles"])
+        # Firma de las fuentes con que se construyó la base que quedó abierta
+        self.firma = json.loads(meta["firma"])
+
+    def _ventana(self, start_date, end_date):
+        return _fecha_iso(dia_inicial(start_date)), _fecha_iso(dia_final(end_date))
+
+    def conversion(self, start_date, end_date, ciudades, granularidad="D"):
+        inicio, fin = self._ventana(start_date, end_date)
+        marcas, ciudades = _lista(ciudades)
+        periodo = EXPRESION_PERIODO[granularidad]
+        sql = f"""
+            WITH v AS (
+                SELECT {periodo} AS periodo, ubicacion, SUM(entradas) AS entradas
+                FROM ventas
+                WHERE fecha BETWEEN ? AND ? AND ubicacion IN ({marcas})
+                GROUP BY 1, 2
+            ), w AS (
+                SELECT {periodo} AS periodo, ubicacion, COUNT(tiempo) AS vistas
+                FROM vistas
+                WHERE fecha BETWEEN ? AND ?
+                GROUP BY 1, 2
+            )
+            SELECT v.periodo AS "Fecha", v.ubicacion AS "Ubicación",
+                   v.entradas AS "Entradas Vendidas", w.vistas AS "Vistas"
+            FROM v JOIN w ON v.periodo = w.periodo AND v.ubicacion = w.ubicacion
+            ORDER BY 1, 2
+        """
+        with etapa("consulta_sql") as e:
+            df = self.pool.leer(sql, [inicio, fin, *ciudades, inicio, fin])
+            e.filas_salida = len(df)
+        df["Fecha"] = pd.to_datetime(df["Fecha"])
+        df["Tasa de Conversión"] = df["Entradas Vendidas"] / df["Vistas"]
+        return df
+
+    def conversion_unicos(self, start_date, end_date, ciudades, granularidad="D"):
+        """Como `CuboDiario.conversion_unicos`, con el conteo exacto de usuarios distintos."""
+        inicio, fin = self._ventana(start_date, end_date)
+        marcas, ciudades = _lista(ciudades)
+        periodo = EXPRESION_PERIODO[granularidad]
+        sql = f"""
+            WITH v AS (
+                SELECT {periodo} AS periodo, ubicacion, SUM(entradas) AS entradas
+                FROM ventas
+                WHERE fecha BETWEEN ? AND ? AND ubicacion IN ({marcas})
+                GROUP BY 1, 2
+            ), w AS (
+                SELECT DISTINCT {periodo} AS periodo, ubicacion
+                FROM vistas
+                WHERE fecha BETWEEN ? AND ?
+            ), c AS (
+                SELECT v.periodo, SUM(v.entradas) AS entradas
+                FROM v JOIN w ON v.periodo = w.periodo AND v.ubicacion = w.ubicacion
+                GROUP BY 1
+            ), u AS (
+                SELECT {periodo} AS periodo, COUNT(DISTINCT id_usuario) AS unicos
+                FROM vistas
+                WHERE fecha BETWEEN ? AND ? AND ubicacion IN ({marcas})
+                GROUP BY 1
+            )
+            SELECT c.periodo AS "Fecha", c.entradas AS "Entradas Vendidas", u.unicos AS "Usuarios Únicos"
+            FROM c JOIN u ON c.periodo = u.periodo
+            ORDER BY 1
+        """
+        with etapa("consulta_sql") as e:
+            df = self.pool.leer(sql, [inicio, fin, *ciudades, inicio, fin, inicio, fin, *ciudades])
+            e.filas_salida = len(df)
+        df["Fecha"] = pd.to_datetime(df["Fecha"])
+        df["Tasa de Conversión"] = df["Entradas Vendidas"] / df["Usuarios Únicos"]
+        return df
+
+    def rentabilidad(self, start_date, end_date, categorias, ciudades, granularidad="D"):
+        inicio, fin = self._ventana(start_date, end_date)
+        marcas_cat, categorias = _lista(categorias)
+        marcas_ciu, ciudades = _lista(ciudades)
+        sql = f"""
+            SELECT {EXPRESION_PERIODO[granularidad]} AS "Fecha", categoria AS "Categoría",
+                   AVG((total - descuento) / total) AS "Índice de Rentabilidad"
+            FROM ventas
+            WHERE fecha BETWEEN ? AND ?
+              AND categoria IN ({marcas_cat}) AND ubicacion IN ({marcas_ciu})
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """
+        with etapa("consulta_sql") as e:
+            df = self.pool.leer(sql, [inicio, fin, *categorias, *ciudades])
+            e.filas_salida = len(df)
+        df["Fecha"] = pd.to_datetime(df["Fecha"])
+        return df
+
+    def satisfaccion(self, eventos, ciudades, por_ciudad):
+        marcas_ev, eventos = _lista(eventos)
+        marcas_ciu, ciudades = _lista(ciudades)
+        claves = 'evento AS "Evento", ubicacion AS "Ubicación"' if por_ciudad else 'evento AS "Evento"'
+        grupos = "1, 2" if por_ciudad else "1"
+        sql = f"""
+            SELECT {claves}, AVG(satisfaccion) AS "Satisfacción"
+            FROM ventas
+            WHERE evento IN ({marcas_ev}) AND ubicacion IN ({marcas_ciu})
+              AND satisfaccion IS NOT NULL
+            GROUP BY {grupos}
+            ORDER BY {grupos}
+        """
+        with etapa("consulta_sql") as e:
+            df = self.pool.leer(sql, [*eventos, *ciudades])
+            e.filas_salida = len(df)
+        return df
+
+    def cuantiles_satisfaccion(self, eventos, ciudades, probabilidades, por_ciudad=False):
+        marcas_ev, eventos = _lista(eventos)
+        marcas_ciu, ciudades = _lista(ciudades)
+        claves = ["Evento", "Ubicación"] if por_ciudad else ["Evento"]
+        columnas = 'evento AS "Evento", ubicacion AS "Ubicación"' if por_ciudad else 'evento AS "Evento"'
+        grupos = "1, 2, 3" if por_ciudad else "1, 2"
+        sql = f"""
+            SELECT {columnas}, cubeta AS "Cubeta", SUM(conteo) AS "Conteo"
+            FROM cubetas_satisfaccion
+            WHERE evento IN ({marcas_ev}) AND ubicacion IN ({marcas_ciu})
+            GROUP BY {grupos}
+        """
+        with etapa("consulta_sql") as e:
+            df = self.pool.leer(sql, [*eventos, *ciudades])
+            e.filas_salida = len(df)
+        with etapa("cuantiles", filas_entrada=len(df)) as e:
+            df = cuantiles(df, claves, probabilidades)
+            e.filas_salida = len(df)
+        return df
+
+    def cuantiles_tiempo(self, start_date, end_date, ciudades, probabilidades, por="Fecha", granularidad="D"):
+        inicio, fin = self._ventana(start_date, end_date)
+        marcas, ciudades = _lista(ciudades)
+        clave = EXPRESION_PERIODO[granularidad] if por == "Fecha" else "ubicacion"
+        sql = f"""
+            SELECT {clave} AS "{por}", cubeta AS "Cubeta", SUM(conteo) AS "Conteo"
+            FROM cubetas_tiempo
+            WHERE fecha BETWEEN ? AND ? AND ubicacion IN ({marcas})
+            GROUP BY 1, 2
+        """
+        with etapa("consulta_sql") as e:
+            df = self.pool.leer(sql, [inicio, fin, *ciudades])
+            e.filas_salida = len(df)
+        if por == "Fecha":
+            df["Fecha"] = pd.to_datetime(df["Fecha"])
+        with etapa("cuantiles", filas_entrada=len(df)) as e:
+            df = cuantiles(df, [por], probabilidades)
+            e.filas_salida = len(df)
+        return df
+
+    def filas(self, tabla, start_date=None, end_date=None, selecciones=None, filas_bloque=50_000):
+        """
+        Filas crudas de `tabla` ("ventas" o "vistas") con los nombres de
+        columna de los CSV, filtradas por Fecha y `selecciones`
+        ({columna: valores}) y leídas por bloques.
+        """
+        columnas = {"ventas": COLUMNAS_VENTAS, "vistas": COLUMNAS_VISTAS}[tabla]
+        condiciones, parametros = [], []
+        if start_date is not None:
+            condiciones.append("fecha >= ?")
+            parametros.append(_fecha_iso(dia_inicial(start_date)))
+        if end_date is not None:
+            condiciones.append("fecha <= ?")
+            parametros.append(_fecha_iso(dia_final(end_date)))
+        for col, valores in (selecciones or {}).items():
+            marcas, valores = _lista(valores)
+            condiciones.append(f"{columnas[col]} IN ({marcas})")
+            parametros.extend(valores)
+        sql = "SELECT " + ", ".join(f'{nombre} AS "{col}"' for col, nombre in columnas.items()) + f" FROM {tabla}"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+
+        with self.pool.dedicada() as con:
+            for bloque in pd.read_sql_query(sql, con, params=parametros, chunksize=filas_bloque):
+                bloque["Fecha"] = pd.to_datetime(bloque["Fecha"])
+                yield bloque
+
+    def resumen(self):
+        """Las mismas tablas que `CuboDiario.resumen`, para el modo cliente."""
+        with etapa("consulta_sql"):
+            ventas = self.pool.leer("""
+                SELECT fecha AS "Fecha", ubicacion AS "Ubicación", categoria AS "Categoría",
+                       SUM(entradas) AS "Entradas Vendidas",
+                       TOTAL((total - descuento) / total) AS "Suma Índice",
+                       COUNT((total - descuento) / total) AS "Conteo Índice"
+                FROM ventas
+                GROUP BY 1, 2, 3
+            """)
+            vistas = self.pool.leer("""
+                SELECT fecha AS "Fecha", ubicacion AS "Ubicación", COUNT(tiempo) AS "Vistas"
+                FROM vistas
+                GROUP BY 1, 2
+            """)
+            satisfaccion = self.pool.leer("""
+                SELECT evento AS "Evento", ubicacion AS "Ubicación",
+                       TOTAL(satisfaccion) AS "Suma Satisfacción",
+                       COUNT(satisfaccion) AS "Conteo Satisfacción"
+                FROM ventas
+                GROUP BY 1, 2
+            """)
+        ventas["Fecha"] = pd.to_datetime(ventas["Fecha"])
+        vistas["Fecha"] = pd.to_datetime(vistas["Fecha"])
+        return {"ventas": ventas, "vistas": vistas, "satisfaccion": satisfaccion}
+
+    # ----------------------------------------------------------------
+    # VALORES PARA LOS CONTROLES DEL LAYOUT
+    # ----------------------------------------------------------------
+    # Calculados al construir la base (ver _controles); no cambian mientras
+    # la firma de las fuentes sea la misma
+    def rango_fechas(self):
+        minimo, maximo = self.controles["rango_fechas"]
+        return pd.Timestamp(minimo), pd.Timestamp(maximo)
+
+    def valores(self, columna):
+        return list(self.controles["valores"][columna])
+
+    def hay_unicos(self):
+        # La tabla vistas siempre se carga con id_usuario
+        return True
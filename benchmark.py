@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import generate
+
+# --------------------------------------------------------------------
+# BENCHMARK DE LOS CALLBACKS
+# --------------------------------------------------------------------
+# Genera datasets sintéticos de distintos tamaños y, para cada uno, lanza
+# un proceso nuevo que importa app.py (midiendo el arranque) y llama a
+# los tres callbacks directamente con combinaciones representativas de
+# filtros. Reporta p50/p95 de latencia, pico de memoria por llamada y RSS
+# máximo del proceso, y escribe todo en JSON para comparar corridas.
+#
+#   python benchmark.py --tamanos 10000,100000,1000000 --salida bench.json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def casos(app):
+    """Combinaciones de entradas por callback: modo x rango x ciudades."""
+    fecha_min, fecha_max = app.fuente().rango_fechas()
+    rango_amplio = (fecha_min.isoformat(), fecha_max.isoformat())
+    rango_estrecho = (fecha_min.isoformat(), (fecha_min + pd.Timedelta(days=6)).isoformat())
+    ciudades = app.fuente().valores("Ubicación")
+    categorias = app.fuente().valores("Categoría")
+    eventos = app.fuente().valores("Evento")
+    selecciones = {"todas": ciudades, "una": ciudades[:1]}
+    rangos = {"amplio": rango_amplio, "estrecho": rango_estrecho}
+
+    modos = ["todo", "comparar"] + (["unicos"] if app.fuente().hay_unicos() else []) + ["tiempo", "tiempo_caja"]
+    for modo in modos:
+        for nombre_rango, (inicio, fin) in rangos.items():
+            for nombre_ciudades, seleccion in selecciones.items():
+                yield (
+                    "conversion", f"{modo}/{nombre_rango}/{nombre_ciudades}",
+                    app.actualizar_conversion, (inicio, fin, seleccion, modo),
+                )
+    for nombre_rango, (inicio, fin) in rangos.items():
+        for nombre_ciudades, seleccion in selecciones.items():
+            yield (
+                "rentabilidad", f"{nombre_rango}/{nombre_ciudades}",
+                app.actualizar_rentabilidad, (inicio, fin, categorias, seleccion),
+            )
+    for modo in ("general", "comparar", "percentiles", "caja"):
+        for nombre_ciudades, seleccion in selecciones.items():
+            yield (
+                "satisfaccion", f"{modo}/{nombre_ciudades}",
+                app.actualizar_satisfaccion, (eventos, seleccion, modo),
+            )
+    # Primera carga de la página: figura precalculada de cada pestaña
+    for pestana, entradas in app.entradas_por_defecto().items():
+        if pestana in app.CALLBACKS_PESTANAS:
+            n_estados = app.CALLBACKS_PESTANAS[pestana][2]
+            yield pestana, "defecto/precalculada", app.servir_figura, (pestana, entradas + (None,) * n_estados)
+
+
+def medir_proceso(repeticiones):
+    """Se ejecuta en el proceso hijo: importa la app y mide cada caso."""
+    inicio = time.perf_counter()
+    import app
+    arranque = time.perf_counter() - inicio
+
+    resultados = []
+    for callback, caso, funcion, args in casos(app):
+        funcion(*args)  # calentamiento
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            funcion(*args)
+            tiempos.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        funcion(*args)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        resultados.append({
+            "callback": callback,
+            "caso": caso,
+            "p50_ms": float(np.percentile(tiempos, 50) * 1000),
+            "p95_ms": float(np.percentile(tiempos, 95) * 1000),
+            "pico_mb": pico / 2**20,
+        })
+
+    return {
+        "arranque_s": arranque,
+        "rss_max_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "callbacks": resultados,
+    }
+
+
+def medir_tamano(directorio, filas_ventas, filas_vistas, repeticiones, config, semilla):
+    path_ventas = os.path.join(directorio, f"ventas_{filas_ventas}.csv")
+    path_vistas = os.path.join(directorio, f"vistas_{filas_vistas}.csv")
+    if not (os.path.exists(path_ventas) and os.path.exists(path_vistas)):
+        generate.generar_archivos(path_ventas, path_vistas, filas_ventas, filas_vistas, config, semilla)
+
+    entorno = {k: v for k, v in os.environ.items() if not k.startswith("DASH_EVENTOS_")}
+    entorno.update({"DASH_EVENTOS_VENTAS": path_ventas, "DASH_EVENTOS_VISTAS": path_vistas})
+    salida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--hijo", "--repeticiones", str(repeticiones)],
+        cwd=BASE_DIR, env=entorno, capture_output=True, text=True, check=True,
+    )
+    resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+    resultado.update({"filas_ventas": filas_ventas, "filas_vistas": filas_vistas})
+    return resultado
+
+
+def imprimir(resultado):
+    print(
+        f"\n{resultado['filas_ventas']:,} ventas / {resultado['filas_vistas']:,} vistas"
+        f" — arranque {resultado['arranque_s']:.2f} s, RSS máx {resultado['rss_max_mb']:.0f} MB"
+    )
+    for r in resultado["callbacks"]:
+        print(
+            f"  {r['callback']:<13} {r['caso']:<26} p50 {r['p50_ms']:8.1f} ms"
+            f"  p95 {r['p95_ms']:8.1f} ms  pico {r['pico_mb']:7.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de latencia y memoria de los callbacks.")
+    parser.add_argument("--tamanos", default="10000,100000,1000000",
+                        help="filas de ventas por dataset, separadas por coma")
+    parser.add_argument("--vistas-por-venta", type=float, default=2.0)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--eventos", type=int, default=20)
+    parser.add_argument("--ciudades", type=int, default=10)
+    parser.add_argument("--usuarios", type=int, default=100_000)
+    parser.add_argument("--dias", type=int, default=730)
+    parser.add_argument("--sesgo", type=float, default=1.0)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--datos", default=None, help="directorio donde guardar/reusar los datasets")
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(medir_proceso(args.repeticiones)))
+        sys.exit(0)
+
+    config = generate.Config(args.eventos, args.ciudades, args.usuarios, args.dias, sesgo=args.sesgo)
+    directorio = args.datos or tempfile.mkdtemp(prefix="dash_eventos_bench_")
+    os.makedirs(directorio, exist_ok=True)
+
+    resultados = []
+    for tamano in (int(t) for t in args.tamanos.split(",")):
+        resultado = medir_tamano(
+            directorio, tamano, int(tamano * args.vistas_por_venta), args.repeticiones, config, args.semilla
+        )
+        imprimir(resultado)
+        resultados.append(resultado)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "maquina": platform.machine(),
+            "parametros": vars(args),
+            "resultados": resultados,
+        }, f, ensure_ascii=False, indent=1)
+    print(f"\nResultados en {args.salida}")
@@ -0,0 +1,105 @@
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+# --------------------------------------------------------------------
+# CACHE DE FIGURAS ENTRE WORKERS
+# --------------------------------------------------------------------
+# Las vistas por defecto (rango completo, todas las ciudades, "todo" /
+# "general") se piden una y otra vez y cada worker de gunicorn volvía a
+# construir la misma figura. Aquí el JSON de la figura se guarda en un
+# archivo SQLite compartido por todos los procesos, con clave en las
+# entradas normalizadas del callback y en la versión de los datos, y con
+# desalojo LRU cuando se supera el tamaño máximo.
+
+
+def normalizar(valor):
+    """Forma canónica de una entrada: listas sin orden y fechas ISO."""
+    if isinstance(valor, (list, tuple, set)) or hasattr(valor, "tolist"):
+        valores = valor.tolist() if hasattr(valor, "tolist") else valor
+        return sorted({str(v) for v in valores})
+    if isinstance(valor, str):
+        try:
+            return pd.Timestamp(valor).isoformat()
+        except ValueError:
+            return valor
+    return valor
+
+
+class CacheFiguras:
+    """Cache LRU de figuras serializadas, acotada a `max_bytes`."""
+
+    def __init__(self, ruta, version, max_bytes=64 * 1024 * 1024):
+        self.ruta = ruta
+        self.version = version
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._conexion() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS figuras ("
+                " clave TEXT PRIMARY KEY, version TEXT, figura TEXT,"
+                " tamano INTEGER, acceso REAL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS figuras_acceso ON figuras (acceso)")
+
+    def _conexion(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def clave(self, nombre, version, args):
+        texto = json.dumps([nombre, version, [normalizar(a) for a in args]], default=str)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def obtener(self, clave):
+        con = self._conexion()
+        fila = con.execute("SELECT figura FROM figuras WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        con.execute("UPDATE figuras SET acceso = ? WHERE clave = ?", (time.time(), clave))
+        return fila[0]
+
+    def guardar(self, clave, version, figura):
+        con = self._conexion()
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            # Las figuras de una versión anterior de los datos ya no sirven
+            con.execute("DELETE FROM figuras WHERE version != ?", (version,))
+            con.execute(
+                "INSERT OR REPLACE INTO figuras VALUES (?, ?, ?, ?, ?)",
+                (clave, version, figura, len(figura), time.time()),
+            )
+            total = con.execute("SELECT COALESCE(SUM(tamano), 0) FROM figuras").fetchone()[0]
+            if total > self.max_bytes:
+                desalojar = []
+                for clave_vieja, tamano in con.execute("SELECT clave, tamano FROM figuras ORDER BY acceso"):
+                    if total <= self.max_bytes:
+                        break
+                    desalojar.append((clave_vieja,))
+                    total -= tamano
+                con.executemany("DELETE FROM figuras WHERE clave = ?", desalojar)
+
+    def memoizar(self, nombre):
+        """Decorador para callbacks que devuelven una figura de Plotly."""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args):
+                version = json.dumps(self.version(), default=str)
+                clave = self.clave(nombre, version, args)
+                texto = self.obtener(clave)
+                if texto is not None:
+                    return json.loads(texto)
+                fig = funcion(*args)
+                self.guardar(clave, version, fig.to_json())
+                return fig
+            return envoltura
+        return decorador
@@ -0,0 +1,439 @@
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+
+import generate
+
+# --------------------------------------------------------------------
+# PRUEBA DE CARGA MULTIUSUARIO
+# --------------------------------------------------------------------
+# Levanta la app con gunicorn para cada combinación de workers x hilos y
+# simula usuarios concurrentes que abren la página y luego, con pausas
+# aleatorias, cambian de pestaña, arrastran el rango de fechas (varias
+# peticiones seguidas, como el DatePickerRange), marcan o desmarcan
+# valores de los dropdowns y cambian el tipo de análisis. Cada cambio se
+# envía a /_dash-update-component igual que el navegador: se disparan
+# todos los callbacks del servidor que tienen esa propiedad como Input,
+# con el id de página (Store "id-pagina") de cada usuario.
+#
+# Por callback reporta peticiones por segundo, p50/p90/p99 de latencia,
+# respuestas 204 (PreventUpdate: pestaña oculta o petición superada),
+# tasa de errores y reintentos por conexiones keep-alive cerradas;
+# subiendo los usuarios se ve dónde satura cada configuración. Todo se
+# escribe en JSON para comparar corridas.
+#
+#   python carga.py --configuraciones 1x1,2x4,4x4 --usuarios 5,20,50 --salida carga.json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Ancho de pantalla que informaría el navegador (ver el Store "ancho-pantalla")
+ANCHO_PANTALLA = 1200
+
+# Controles de cada pestaña que modifican los usuarios simulados
+CONTROLES = {
+    "conversion": {
+        "fechas": "rango-fechas-conversion",
+        "selecciones": ["filtro-ciudad-conversion"],
+        "tipo": "tipo-analisis-conversion",
+    },
+    "rentabilidad": {
+        "fechas": "rango-fechas-rentabilidad",
+        "selecciones": ["filtro-categoria", "filtro-ciudad-rentabilidad"],
+        "tipo": None,
+    },
+    "satisfaccion": {
+        "fechas": None,
+        "selecciones": ["filtro-evento", "filtro-ciudad-satisfaccion"],
+        "tipo": "tipo-analisis-satisfaccion",
+    },
+}
+# Peso relativo de cada acción de un usuario
+ACCIONES = {"pestana": 1.0, "arrastre": 3.0, "seleccion": 3.0, "tipo": 1.0, "recarga": 0.2}
+
+
+def propiedades(nodo, valores):
+    """Recorre el árbol de /_dash-layout y guarda las props de cada componente con id."""
+    if isinstance(nodo, list):
+        for hijo in nodo:
+            propiedades(hijo, valores)
+    elif isinstance(nodo, dict) and "props" in nodo:
+        props = nodo["props"]
+        if isinstance(props.get("id"), str):
+            for prop, valor in props.items():
+                if prop != "children":
+                    valores[(props["id"], prop)] = valor
+        propiedades(props.get("children"), valores)
+    return valores
+
+
+def _fecha(valor):
+    return datetime.fromisoformat(valor).date()
+
+
+class Registro:
+    """Latencias y resultados por callback, compartidos entre los usuarios."""
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self.latencias = {}
+        self.estados = {}
+        self.reintentos = {}
+
+    def anotar(self, callback, segundos, estado, reintentos=0):
+        with self._candado:
+            self.latencias.setdefault(callback, []).append(segundos)
+            conteo = self.estados.setdefault(callback, {})
+            conteo[estado] = conteo.get(estado, 0) + 1
+            self.reintentos[callback] = self.reintentos.get(callback, 0) + reintentos
+
+    def resumen(self, duracion):
+        resultado = {}
+        for callback, latencias in sorted(self.latencias.items()):
+            estados = self.estados[callback]
+            total = len(latencias)
+            errores = sum(n for estado, n in estados.items() if estado not in ("200", "204"))
+            ms = np.array(latencias) * 1000
+            resultado[callback] = {
+                "peticiones": total,
+                "por_segundo": total / duracion,
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p90_ms": float(np.percentile(ms, 90)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+                "sin_cambios": estados.get("204", 0) / total,
+                "tasa_error": errores / total,
+                "reintentos": self.reintentos[callback],
+                "estados": estados,
+            }
+        return resultado
+
+
+class Usuario:
+    """Una página del navegador: valores actuales de los controles y su id."""
+
+    def __init__(self, url, dependencias, registro, rng, timeout, arrastre_ms):
+        self.url = url
+        self.dependencias = dependencias
+        self.registro = registro
+        self.rng = rng
+        self.timeout = timeout
+        self.arrastre_ms = arrastre_ms
+        self.http = requests.Session()
+        self.valores = {}
+        self.limites = {}
+
+    def _pedir(self, callback, metodo, ruta, **kwargs):
+        inicio = time.perf_counter()
+        reintentos = 0
+        while True:
+            try:
+                respuesta = self.http.request(metodo, self.url + ruta, timeout=self.timeout, **kwargs)
+                estado = str(respuesta.status_code)
+            except requests.ConnectionError as error:
+                # El servidor cerró una conexión keep-alive justo cuando se
+                # reusaba; el navegador reintenta en ese caso, una sola vez
+                if not reintentos and "Connection aborted" in str(error):
+                    reintentos += 1
+                    continue
+                respuesta, estado = None, type(error).__name__
+            except requests.RequestException as error:
+                respuesta, estado = None, type(error).__name__
+            break
+        self.registro.anotar(callback, time.perf_counter() - inicio, estado, reintentos)
+        return respuesta
+
+    def abrir(self):
+        """Carga la página (layout e id de página) y espera los callbacks iniciales."""
+        self._pedir("pagina", "GET", "/")
+        respuesta = self._pedir("_dash-layout", "GET", "/_dash-layout")
+        if respuesta is None or respuesta.status_code != 200:
+            return False
+        self.valores = propiedades(respuesta.json(), {})
+        self.valores[("ancho-pantalla", "data")] = ANCHO_PANTALLA
+        for controles in CONTROLES.values():
+            if controles["fechas"]:
+                self.limites[controles["fechas"]] = (
+                    _fecha(self.valores[(controles["fechas"], "start_date")]),
+                    _fecha(self.valores[(controles["fechas"], "end_date")]),
+                )
+        for hilo in self._en_paralelo([(dep, []) for dep in self.dependencias]):
+            hilo.join()
+        return True
+
+    def _cuerpo(self, dep, cambiados):
+        """Cuerpo de /_dash-update-component con los valores del momento del cambio."""
+        id_salida, prop_salida = dep["output"].rsplit(".", 1)
+        return {
+            "output": dep["output"],
+            "outputs": {"id": id_salida, "property": prop_salida},
+            "inputs": [
+                {**e, "value": self.valores.get((e["id"], e["property"]))} for e in dep["inputs"]
+            ],
+            "changedPropIds": [f"{id_}.{prop}" for id_, prop in cambiados],
+            "state": [
+                {**e, "value": self.valores.get((e["id"], e["property"]))} for e in dep["state"]
+            ],
+        }
+
+    def _actualizar(self, cuerpo):
+        id_salida = cuerpo["outputs"]["id"]
+        self._pedir(id_salida, "POST", "/_dash-update-component", json=cuerpo)
+
+    def _en_paralelo(self, peticiones):
+        # Los cuerpos se arman antes de lanzar los hilos, como hace el navegador
+        cuerpos = [self._cuerpo(dep, cambiados) for dep, cambiados in peticiones]
+        hilos = [threading.Thread(target=self._actualizar, args=(cuerpo,)) for cuerpo in cuerpos]
+        for hilo in hilos:
+            hilo.start()
+        return hilos
+
+    def cambiar(self, cambios):
+        """Aplica `cambios` ({(id, prop): valor}) y dispara los callbacks afectados sin esperarlos."""
+        self.valores.update(cambios)
+        afectadas = [
+            dep for dep in self.dependencias
+            if any((e["id"], e["property"]) in cambios for e in dep["inputs"])
+        ]
+        return self._en_paralelo([(dep, list(cambios)) for dep in afectadas])
+
+    # ----------------------------------------------------------------
+    # ACCIONES
+    # ----------------------------------------------------------------
+    def pestana_actual(self):
+        return self.valores[("pestanas", "value")]
+
+    def cambiar_pestana(self):
+        otras = [p for p in CONTROLES if p != self.pestana_actual()]
+        return self.cambiar({("pestanas", "value"): self.rng.choice(otras)})
+
+    def arrastrar_fechas(self):
+        """Varios cambios seguidos de una punta del rango, sin esperar respuestas."""
+        id_fechas = CONTROLES[self.pestana_actual()]["fechas"]
+        if id_fechas is None:
+            return self.marcar_seleccion()
+        minimo, maximo = self.limites[id_fechas]
+        prop = self.rng.choice(["start_date", "end_date"])
+        direccion = self.rng.choice([-1, 1])
+        hilos = []
+        for paso in range(self.rng.randint(3, 8)):
+            if paso:
+                time.sleep(self.arrastre_ms / 1000)
+            inicio = _fecha(self.valores[(id_fechas, "start_date")])
+            fin = _fecha(self.valores[(id_fechas, "end_date")])
+            dias = timedelta(days=direccion * self.rng.randint(1, 15))
+            if prop == "start_date":
+                nuevo = min(max(inicio + dias, minimo), fin)
+            else:
+                nuevo = max(min(fin + dias, maximo), inicio)
+            hilos += self.cambiar({(id_fechas, prop): nuevo.isoformat()})
+        return hilos
+
+    def marcar_seleccion(self):
+        """Marca o desmarca un valor de un dropdown (nunca lo deja vacío)."""
+        id_dropdown = self.rng.choice(CONTROLES[self.pestana_actual()]["selecciones"])
+        opciones = [o["value"] for o in self.valores[(id_dropdown, "options")]]
+        actual = list(self.valores[(id_dropdown, "value")] or [])
+        valor = self.rng.choice(opciones)
+        if valor in actual and len(actual) > 1:
+            actual.remove(valor)
+        elif valor not in actual:
+            actual.append(valor)
+        return self.cambiar({(id_dropdown, "value"): actual})
+
+    def cambiar_tipo(self):
+        id_radio = CONTROLES[self.pestana_actual()]["tipo"]
+        if id_radio is None:
+            return self.marcar_seleccion()
+        opciones = [o["value"] for o in self.valores[(id_radio, "options")]]
+        otras = [o for o in opciones if o != self.valores[(id_radio, "value")]]
+        return self.cambiar({(id_radio, "value"): self.rng.choice(otras)})
+
+    def recargar(self):
+        self.abrir()
+        return []
+
+    def actuar(self):
+        accion = self.rng.choices(list(ACCIONES), weights=list(ACCIONES.values()))[0]
+        hilos = {
+            "pestana": self.cambiar_pestana,
+            "arrastre": self.arrastrar_fechas,
+            "seleccion": self.marcar_seleccion,
+            "tipo": self.cambiar_tipo,
+            "recarga": self.recargar,
+        }[accion]()
+        # El usuario mira el resultado antes de seguir
+        for hilo in hilos:
+            hilo.join()
+
+
+def simular(url, usuarios, duracion, pausa, arrastre_ms, timeout, semilla):
+    """`usuarios` sesiones concurrentes durante `duracion` segundos; devuelve el registro."""
+    dependencias = [
+        dep for dep in requests.get(url + "/_dash-dependencies", timeout=timeout).json()
+        if not dep.get("clientside_function")
+    ]
+    registro = Registro()
+    fin = time.monotonic() + duracion
+
+    def sesion(indice):
+        rng = random.Random(semilla * 100_003 + indice)
+        usuario = Usuario(url, dependencias, registro, rng, timeout, arrastre_ms)
+        # Llegadas escalonadas durante la primera pausa
+        time.sleep(rng.uniform(0, pausa))
+        if not usuario.abrir():
+            return
+        while time.monotonic() < fin:
+            usuario.actuar()
+            time.sleep(rng.expovariate(1 / pausa) if pausa else 0)
+
+    hilos = [threading.Thread(target=sesion, args=(i,), daemon=True) for i in range(usuarios)]
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return registro, time.monotonic() - inicio
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(workers, hilos, entorno, espera):
+    """Lanza gunicorn con la app y espera a que responda el layout."""
+    puerto = puerto_libre()
+    # El log va a un archivo temporal y no a un pipe: nadie lee el pipe
+    # durante la carga, y al llenarse bloquearía a los workers al escribir
+    with tempfile.TemporaryFile() as log:
+        proceso = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "app:server",
+             "--workers", str(workers), "--threads", str(hilos),
+             "--bind", f"127.0.0.1:{puerto}", "--timeout", "300"],
+            cwd=BASE_DIR, env=entorno, stdout=subprocess.DEVNULL, stderr=log,
+        )
+        url = f"http://127.0.0.1:{puerto}"
+        limite = time.monotonic() + espera
+        while time.monotonic() < limite:
+            if proceso.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(f"gunicorn terminó al arrancar:\n{log.read().decode(errors='replace')}")
+            try:
+                if requests.get(url + "/_dash-layout", timeout=5).status_code == 200:
+                    return proceso, url
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        proceso.terminate()
+        raise RuntimeError(f"gunicorn no respondió en {espera} s")
+
+
+def detener_servidor(proceso):
+    proceso.terminate()
+    try:
+        proceso.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+        proceso.wait()
+
+
+def imprimir(resultado):
+    print(
+        f"\n{resultado['workers']} workers x {resultado['hilos']} hilos, {resultado['usuarios']} usuarios"
+        f" — {resultado['por_segundo']:.1f} peticiones/s, errores {resultado['tasa_error']:.1%}"
+    )
+    for callback, r in resultado["callbacks"].items():
+        print(
+            f"  {callback:<22} {r['por_segundo']:7.1f}/s  p50 {r['p50_ms']:8.1f} ms"
+            f"  p90 {r['p90_ms']:8.1f} ms  p99 {r['p99_ms']:8.1f} ms"
+            f"  204 {r['sin_cambios']:6.1%}  errores {r['tasa_error']:6.1%}  reintentos {r['reintentos']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga multiusuario sobre gunicorn.")
+    parser.add_argument("--configuraciones", default="1x1,1x4,2x4,4x4",
+                        help="workers x hilos de gunicorn, separados por coma")
+    parser.add_argument("--usuarios", default="5,20,50", help="usuarios simultáneos, separados por coma")
+    parser.add_argument("--duracion", type=float, default=30, help="segundos de medición por nivel")
+    parser.add_argument("--calentamiento", type=float, default=5, help="segundos de carga sin medir")
+    parser.add_argument("--pausa", type=float, default=1.0, help="pausa media entre acciones (s)")
+    parser.add_argument("--arrastre-ms", type=float, default=80, help="ms entre cambios de un arrastre")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--espera", type=float, default=300, help="segundos máximos de arranque")
+    parser.add_argument("--tamano", type=int, default=None,
+                        help="filas de ventas de un dataset sintético (por defecto, los CSV de la app)")
+    parser.add_argument("--vistas-por-venta", type=float, default=2.0)
+    parser.add_argument("--datos", default=None, help="directorio donde guardar/reusar el dataset")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="carga.json")
+    args = parser.parse_args()
+
+    # Las variables DASH_EVENTOS_* del entorno (SQLite, hilos, cache...) pasan a la app
+    entorno = dict(os.environ)
+    if args.tamano:
+        directorio = args.datos or tempfile.mkdtemp(prefix="dash_eventos_carga_")
+        os.makedirs(directorio, exist_ok=True)
+        filas_vistas = int(args.tamano * args.vistas_por_venta)
+        path_ventas = os.path.join(directorio, f"ventas_{args.tamano}.csv")
+        path_vistas = os.path.join(directorio, f"vistas_{filas_vistas}.csv")
+        if not (os.path.exists(path_ventas) and os.path.exists(path_vistas)):
+            generate.generar_archivos(
+                path_ventas, path_vistas, args.tamano, filas_vistas,
+                generate.Config(20, 10, 100_000, 730), args.semilla,
+            )
+        entorno.update({"DASH_EVENTOS_VENTAS": path_ventas, "DASH_EVENTOS_VISTAS": path_vistas})
+
+    resultados = []
+    for configuracion in args.configuraciones.split(","):
+        workers, hilos = (int(n) for n in configuracion.lower().split("x"))
+        proceso, url = iniciar_servidor(workers, hilos, entorno, args.espera)
+        try:
+            if args.calentamiento:
+                simular(url, max(workers * hilos, 2), args.calentamiento, args.pausa,
+                        args.arrastre_ms, args.timeout, args.semilla)
+            for usuarios in (int(u) for u in args.usuarios.split(",")):
+                registro, duracion = simular(
+                    url, usuarios, args.duracion, args.pausa, args.arrastre_ms, args.timeout, args.semilla
+                )
+                callbacks = registro.resumen(duracion)
+                total = sum(r["peticiones"] for r in callbacks.values())
+                errores = sum(r["tasa_error"] * r["peticiones"] for r in callbacks.values())
+                resultado = {
+                    "workers": workers,
+                    "hilos": hilos,
+                    "usuarios": usuarios,
+                    "duracion_s": duracion,
+                    "por_segundo": total / duracion,
+                    "tasa_error": errores / total if total else 0.0,
+                    "callbacks": callbacks,
+                }
+                imprimir(resultado)
+                resultados.append(resultado)
+        finally:
+            detener_servidor(proceso)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "maquina": platform.machine(),
+            "cpus": os.cpu_count(),
+            "entorno": {k: v for k, v in entorno.items() if k.startswith("DASH_EVENTOS_")},
+            "parametros": vars(args),
+            "resultados": resultados,
+        }, f, ensure_ascii=False, indent=1)
+    print(f"\nResultados en {args.salida}")
@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+import pandas as pd
+import plotly.io as pio
+
+import reduccion
+from columnar import fechas_a_dias
+
+# --------------------------------------------------------------------
+# MODO CLIENTE: RESUMEN COLUMNAR PARA EL NAVEGADOR
+# --------------------------------------------------------------------
+# Las tres gráficas se pueden resolver con tablas chicas: ventas y vistas
+# por día y ciudad (y categoría) y satisfacción por Evento x Ubicación.
+# En modo cliente esas tablas viajan una sola vez, dentro del layout, en
+# un dcc.Store; los callbacks de assets/cliente.js filtran, agrupan y
+# arman las figuras en el navegador sin volver al servidor.
+#
+# Formato: columnas como listas; las fechas son días desde 1970-01-01 y
+# las dimensiones son códigos sobre diccionarios ordenados (-1 = faltante).
+
+DECIMALES = 8
+
+
+def _diccionario(*series):
+    """Valores distintos de una dimensión en todas las tablas, ordenados."""
+    valores = set()
+    for serie in series:
+        valores.update(str(v) for v in serie.dropna().unique())
+    return sorted(valores)
+
+
+def _codigos(serie, diccionario):
+    return pd.Categorical(serie, categories=diccionario).codes.astype("int64").tolist()
+
+
+def empaquetar(resumen):
+    """Convierte las tablas de `resumen()` al formato que lee cliente.js."""
+    ventas = resumen["ventas"]
+    vistas = resumen["vistas"]
+    satisfaccion = resumen["satisfaccion"]
+    # Las filas sin fecha nunca entran en una ventana de fechas
+    ventas = ventas[ventas["Fecha"].notna()]
+    vistas = vistas[vistas["Fecha"].notna()]
+
+    # Un solo diccionario por dimensión, compartido entre tablas
+    ubicaciones = _diccionario(ventas["Ubicación"], vistas["Ubicación"], satisfaccion["Ubicación"])
+    categorias = _diccionario(ventas["Categoría"])
+    eventos = _diccionario(satisfaccion["Evento"])
+
+    return {
+        "ubicaciones": ubicaciones,
+        "categorias": categorias,
+        "eventos": eventos,
+        "ventas": {
+            "dia": fechas_a_dias(ventas["Fecha"]).tolist(),
+            "ubicacion": _codigos(ventas["Ubicación"], ubicaciones),
+            "categoria": _codigos(ventas["Categoría"], categorias),
+            "entradas": ventas["Entradas Vendidas"].astype("int64").tolist(),
+            # DECIMALES sobran para la gráfica y acortan bastante el JSON
+            "suma_indice": ventas["Suma Índice"].astype("float64").round(DECIMALES).tolist(),
+            "conteo_indice": ventas["Conteo Índice"].astype("int64").tolist(),
+        },
+        "vistas": {
+            "dia": fechas_a_dias(vistas["Fecha"]).tolist(),
+            "ubicacion": _codigos(vistas["Ubicación"], ubicaciones),
+            "vistas": vistas["Vistas"].astype("int64").tolist(),
+        },
+        "satisfaccion": {
+            "evento": _codigos(satisfaccion["Evento"], eventos),
+            "ubicacion": _codigos(satisfaccion["Ubicación"], ubicaciones),
+            "suma": satisfaccion["Suma Satisfacción"].astype("float64").round(DECIMALES).tolist(),
+            "conteo": satisfaccion["Conteo Satisfacción"].astype("int64").tolist(),
+        },
+        # Los mismos umbrales de reducción que usan los callbacks del servidor
+        "parametros": {
+            "ancho_defecto": reduccion.ANCHO_DEFECTO,
+            "ancho_maximo": reduccion.ANCHO_MAXIMO,
+            "fraccion_grafico": reduccion.FRACCION_GRAFICO,
+            "puntos_minimos": reduccion.PUNTOS_MINIMOS,
+            "factor_lttb": reduccion.FACTOR_LTTB,
+            "puntos_webgl": reduccion.PUNTOS_WEBGL,
+        },
+        "plantilla": pio.templates[pio.templates.default].to_plotly_json(),
+    }
+
+
+@lru_cache(maxsize=1)
+def paquete(origen):
+    """
+    Resumen empaquetado de `origen` (cubo o base SQL). La ingesta reemplaza
+    el cubo por uno nuevo, así que el paquete se recalcula sólo cuando
+    cambian los datos.
+    """
+    return empaquetar(origen.resumen())
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------------------------
+# DATASET COLUMNAR PARTICIONADO POR MES
+# --------------------------------------------------------------------
+# Cada tabla se guarda como un directorio por mes (AAAA-MM) con un
+# archivo .npy por columna. Las fechas se guardan como número de día
+# (int32) y los textos como códigos enteros de un diccionario común a
+# todas las particiones, descrito en esquema.json. Así el arranque no
+# parsea texto y una consulta de un mes sólo abre los archivos de ese mes.
+#
+# Estructura:
+#   <destino>/<tabla>/esquema.json
+#   <destino>/<tabla>/2024-01/Fecha.npy, Evento.npy, ...
+
+ESQUEMA = "esquema.json"
+EPOCA = np.datetime64("1970-01-01", "D")
+
+
+def fechas_a_dias(fechas):
+    """datetime64 -> número de día (int32); NaT se guarda como INT32_MIN."""
+    valores = pd.to_datetime(fechas).values.astype("datetime64[D]")
+    dias = (valores - EPOCA).astype("int64")
+    dias[np.isnat(valores)] = np.iinfo("int32").min
+    return dias.astype("int32")
+
+
+def dias_a_fechas(dias):
+    """Número de día (int32) -> datetime64[ns]."""
+    dias = np.asarray(dias)
+    fechas = (EPOCA + dias.astype("int64")).astype("datetime64[ns]")
+    fechas[dias == np.iinfo("int32").min] = np.datetime64("NaT")
+    return fechas
+
+
+def dia_inicial(start_date):
+    """Primer día incluido por `Fecha >= start_date`."""
+    inicio = pd.Timestamp(start_date)
+    dia = int(fechas_a_dias([inicio.normalize()])[0])
+    return dia + 1 if inicio != inicio.normalize() else dia
+
+
+def dia_final(end_date):
+    """Último día incluido por `Fecha <= end_date`."""
+    return int(fechas_a_dias([pd.Timestamp(end_date).normalize()])[0])
+
+
+def codificar_texto(valores):
+    """Devuelve (códigos, diccionario) con -1 para valores faltantes."""
+    codigos, diccionario = pd.factorize(pd.Series(valores), sort=True)
+    dtype = "int16" if len(diccionario) < np.iinfo("int16").max else "int32"
+    return codigos.astype(dtype), [str(v) for v in diccionario]
+
+
+def _es_texto(serie):
+    return serie.dtype == object or isinstance(serie.dtype, pd.CategoricalDtype)
+
+
+# --------------------------------------------------------------------
+# ESCRITURA
+# --------------------------------------------------------------------
+def escribir_tabla(df, destino):
+    """Escribe `df` (con columna Fecha) particionado por mes en `destino`."""
+    temporal = destino + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    columnas = {}
+    esquema = {"columnas": [], "diccionarios": {}, "particiones": []}
+    for col in df.columns:
+        if col == "Fecha":
+            columnas[col] = fechas_a_dias(df[col])
+            tipo = "fecha"
+        elif _es_texto(df[col]):
+            columnas[col], esquema["diccionarios"][col] = codificar_texto(df[col])
+            tipo = "texto"
+        else:
+            columnas[col] = df[col].to_numpy()
+            tipo = "numero"
+        esquema["columnas"].append({"nombre": col, "tipo": tipo})
+
+    meses = pd.to_datetime(df["Fecha"]).dt.strftime("%Y-%m").fillna("sin-fecha").to_numpy()
+    orden = np.argsort(columnas["Fecha"], kind="stable")
+    for mes in sorted(set(meses)):
+        filas = orden[meses[orden] == mes]
+        carpeta = os.path.join(temporal, mes)
+        os.makedirs(carpeta)
+        for col, valores in columnas.items():
+            np.save(os.path.join(carpeta, col + ".npy"), valores[filas])
+        esquema["particiones"].append({"mes": mes, "filas": int(len(filas))})
+
+    with open(os.path.join(temporal, ESQUEMA), "w", encoding="utf-8") as f:
+        json.dump(esquema, f, ensure_ascii=False, indent=1)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.rename(temporal, destino)
+
+
+def convertir_csv(path_csv, destino):
+    df = pd.read_csv(path_csv, parse_dates=["Fecha"])
+    escribir_tabla(df, destino)
+    return len(df)
+
+
+# --------------------------------------------------------------------
+# LECTURA CON PODA DE PARTICIONES
+# --------------------------------------------------------------------
+def _mes_solapa(mes, inicio, fin):
+    if mes == "sin-fecha":
+        return inicio is None and fin is None
+    primero = pd.Timestamp(mes + "-01")
+    ultimo = primero + pd.offsets.MonthEnd(0)
+    return (inicio is None or ultimo >= inicio) and (fin is None or primero <= fin)
+
+
+class DatasetColumnar:
+    """Lector de una tabla columnar; sólo abre los meses que pide la consulta."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        with open(os.path.join(directorio, ESQUEMA), encoding="utf-8") as f:
+            self.esquema = json.load(f)
+        self.columnas = [c["nombre"] for c in self.esquema["columnas"]]
+        self.tipos = {c["nombre"]: c["tipo"] for c in self.esquema["columnas"]}
+        # El código -1 (faltante) cae en el NaN que se agrega al final
+        self.diccionarios = {
+            col: np.array(valores + [np.nan], dtype=object)
+            for col, valores in self.esquema["diccionarios"].items()
+        }
+
+    def particiones(self, start_date=None, end_date=None):
+        inicio = pd.Timestamp(start_date).normalize() if start_date is not None else None
+        fin = pd.Timestamp(end_date) if end_date is not None else None
+        return [
+            p["mes"] for p in self.esquema["particiones"]
+            if _mes_solapa(p["mes"], inicio, fin)
+        ]
+
+    def leer_arreglos(self, start_date=None, end_date=None, columnas=None):
+        """Columnas crudas (códigos / días) de las particiones que solapan la ventana."""
+        columnas = columnas or self.columnas
+        if "Fecha" not in columnas:
+            columnas = ["Fecha"] + list(columnas)
+        meses = self.particiones(start_date, end_date)
+
+        partes = {col: [] for col in columnas}
+        for mes in meses:
+            for col in columnas:
+                ruta = os.path.join(self.directorio, mes, col + ".npy")
+                partes[col].append(np.load(ruta))
+        arreglos = {
+            col: np.concatenate(valores) if valores else np.empty(0, dtype="int32")
+            for col, valores in partes.items()
+        }
+
+        # Ajuste fino dentro de los meses del borde de la ventana
+        if start_date is not None or end_date is not None:
+            dias = arreglos["Fecha"]
+            mascara = np.ones(len(dias), dtype=bool)
+            if start_date is not None:
+                mascara &= dias >= dia_inicial(start_date)
+            if end_date is not None:
+                mascara &= (dias <= dia_final(end_date)) & (dias != np.iinfo("int32").min)
+            if not mascara.all():
+                arreglos = {col: valores[mascara] for col, valores in arreglos.items()}
+        return arreglos
+
+    def bloques(self, start_date=None, end_date=None, columnas=None):
+        """
+        Un DataFrame por partición mensual que solapa la ventana, para
+        recorrer la tabla sin cargarla entera; los demás meses no se abren.
+        """
+        for mes in self.particiones(start_date, end_date):
+            if mes == "sin-fecha":
+                continue
+            inicio = pd.Timestamp(mes + "-01")
+            fin = inicio + pd.offsets.MonthEnd(0)
+            if start_date is not None:
+                inicio = max(inicio, pd.Timestamp(start_date))
+            if end_date is not None:
+                fin = min(fin, pd.Timestamp(end_date))
+            yield self.leer(inicio, fin, columnas)
+
+    def leer(self, start_date=None, end_date=None, columnas=None):
+        """DataFrame equivalente al de `pd.read_csv` para la ventana pedida."""
+        arreglos = self.leer_arreglos(start_date, end_date, columnas)
+        datos = {}
+        for col, valores in arreglos.items():
+            if self.tipos[col] == "fecha":
+                datos[col] = dias_a_fechas(valores)
+            elif self.tipos[col] == "texto":
+                datos[col] = self.diccionarios[col].take(valores)
+            else:
+                datos[col] = valores
+        return pd.DataFrame(datos, columns=list(arreglos))
+
+
+# --------------------------------------------------------------------
+# CONVERSIÓN DESDE CSV
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Convierte los CSV a un dataset columnar particionado por mes.")
+    parser.add_argument("--ventas", default=os.path.join(BASE_DIR, "ventas_eventos.csv"))
+    parser.add_argument("--vistas", default=os.path.join(BASE_DIR, "vistas_eventos.csv"))
+    parser.add_argument("--destino", default=os.path.join(BASE_DIR, "datos_columnar"))
+    args = parser.parse_args()
+
+    for tabla, path_csv in (("ventas", args.ventas), ("vistas", args.vistas)):
+        filas = convertir_csv(path_csv, os.path.join(args.destino, tabla))
+        print(f"{tabla}: {filas} filas escritas en {os.path.join(args.destino, tabla)}")
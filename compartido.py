@@ -0,0 +1,235 @@
+import fcntl
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from columnar import dias_a_fechas, fechas_a_dias
+
+# --------------------------------------------------------------------
+# TABLAS COMPACTAS EN MEMORIA COMPARTIDA
+# --------------------------------------------------------------------
+# Con gunicorn cada worker guardaba su propia copia de df_ventas y
+# df_vistas con textos en dtype object. Aquí las tablas se codifican una
+# sola vez en un formato compacto (categorías como códigos int8/int16,
+# enteros angostos, float32 y Fecha como número de día int32) y se
+# publican como archivos .npy en un directorio de memoria compartida
+# (p. ej. /dev/shm/dash_eventos). Cada worker los abre con mmap de sólo
+# lectura, así que todos leen las mismas páginas físicas y la memoria no
+# crece al agregar workers.
+#
+# Los diccionarios de las categorías (p. ej. los ID Usuario) también se
+# publican como buffers: los textos UTF-8 concatenados y sus
+# desplazamientos. Ningún worker arma el diccionario completo como
+# objetos de Python; `tramos` decodifica sólo los valores que aparecen
+# en cada tramo.
+#
+# Estructura:
+#   <directorio>/<tabla>/esquema.json
+#   <directorio>/<tabla>/<columna>.npy                 (códigos)
+#   <directorio>/<tabla>/<columna>.texto.npy           (uint8, UTF-8)
+#   <directorio>/<tabla>/<columna>.desplazamientos.npy (int64, n + 1)
+
+ESQUEMA = "esquema.json"
+# Sube cuando cambia el formato; una publicación anterior se republica
+FORMATO = 2
+
+
+def _codigos_angostos(codigos, n_categorias):
+    for dtype in ("int8", "int16", "int32"):
+        if n_categorias < np.iinfo(dtype).max:
+            return codigos.astype(dtype)
+    return codigos.astype("int64")
+
+
+def _entero_angosto(valores):
+    minimo, maximo = (int(valores.min()), int(valores.max())) if len(valores) else (0, 0)
+    for dtype in ("int8", "int16", "int32"):
+        info = np.iinfo(dtype)
+        if info.min <= minimo and maximo <= info.max:
+            return valores.astype(dtype)
+    return valores
+
+
+def _diccionario(categorias):
+    """(texto, desplazamientos) con las categorías en UTF-8 concatenadas."""
+    codificadas = [str(c).encode("utf-8") for c in categorias]
+    desplazamientos = np.zeros(len(codificadas) + 1, dtype="int64")
+    np.cumsum([len(c) for c in codificadas], out=desplazamientos[1:])
+    return np.frombuffer(b"".join(codificadas), dtype="uint8"), desplazamientos
+
+
+class Diccionario:
+    """Categorías de una columna sobre los buffers compartidos."""
+
+    def __init__(self, texto, desplazamientos):
+        self.texto = texto
+        self.desplazamientos = desplazamientos
+
+    def __len__(self):
+        return len(self.desplazamientos) - 1
+
+    def valores(self, codigos):
+        """Textos de los `codigos` indicados, en el mismo orden."""
+        texto, desplazamientos = self.texto, self.desplazamientos
+        return [
+            texto[desplazamientos[c]:desplazamientos[c + 1]].tobytes().decode("utf-8")
+            for c in codigos
+        ]
+
+    def decodificar(self, codigos):
+        """
+        Categorical con sólo las categorías presentes en `codigos` (-1 es
+        nulo). El diccionario está ordenado, así que las categorías
+        también.
+        """
+        if len(self) <= len(codigos):
+            # Diccionario chico frente al tramo: conteo en vez de ordenar
+            desplazados = codigos.astype(np.intp) + 1
+            usados = np.flatnonzero(np.bincount(desplazados, minlength=len(self) + 1)[1:])
+            mapa = np.full(len(self) + 1, -1, dtype=np.intp)
+            mapa[usados + 1] = np.arange(len(usados))
+            inversa = mapa[desplazados]
+        else:
+            usados, inversa = np.unique(codigos, return_inverse=True)
+            if len(usados) and usados[0] < 0:
+                usados = usados[1:]
+                inversa = inversa - 1
+        return pd.Categorical.from_codes(inversa, categories=self.valores(usados))
+
+
+def compactar(df):
+    """Devuelve (columnas, esquema) con los dtypes más angostos posibles."""
+    columnas = {}
+    esquema = {"columnas": []}
+    for col in df.columns:
+        serie = df[col]
+        descripcion = {"nombre": col}
+        if col == "Fecha":
+            columnas[col] = fechas_a_dias(serie)
+            descripcion["tipo"] = "fecha"
+        elif serie.dtype == object or isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos, categorias = pd.factorize(serie, sort=True)
+            columnas[col] = _codigos_angostos(codigos, len(categorias))
+            columnas[col + ".texto"], columnas[col + ".desplazamientos"] = _diccionario(categorias)
+            descripcion["tipo"] = "categoria"
+        elif pd.api.types.is_integer_dtype(serie.dtype):
+            columnas[col] = _entero_angosto(serie.to_numpy())
+            descripcion["tipo"] = "numero"
+        else:
+            columnas[col] = serie.to_numpy(dtype="float32")
+            descripcion["tipo"] = "numero"
+        esquema["columnas"].append(descripcion)
+    return columnas, esquema
+
+
+def publicar(df, destino, firma=None):
+    """Escribe la tabla compacta en `destino` de forma atómica."""
+    columnas, esquema = compactar(df)
+    esquema["firma"] = firma
+    esquema["formato"] = FORMATO
+
+    temporal = destino + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    for col, valores in columnas.items():
+        np.save(os.path.join(temporal, col + ".npy"), valores)
+    with open(os.path.join(temporal, ESQUEMA), "w", encoding="utf-8") as f:
+        json.dump(esquema, f, ensure_ascii=False)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.rename(temporal, destino)
+
+
+def leer_firma(destino):
+    """Firma de la publicación; None si falta o tiene otro formato."""
+    try:
+        with open(os.path.join(destino, ESQUEMA), encoding="utf-8") as f:
+            esquema = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return esquema.get("firma") if esquema.get("formato") == FORMATO else None
+
+
+def adjuntar(destino):
+    """
+    DataFrame sobre los buffers compartidos (mmap de sólo lectura). No se
+    copia ninguna columna: Fecha queda como número de día int32, las
+    categorías como sus códigos (con el `Diccionario` en
+    `df.attrs["diccionarios"]`) y ambas se expanden por tramos con
+    `tramos`.
+    """
+    with open(os.path.join(destino, ESQUEMA), encoding="utf-8") as f:
+        esquema = json.load(f)
+
+    def cargar(nombre):
+        return np.load(os.path.join(destino, nombre + ".npy"), mmap_mode="r")
+
+    datos, diccionarios = {}, {}
+    for descripcion in esquema["columnas"]:
+        col = descripcion["nombre"]
+        datos[col] = cargar(col)
+        if descripcion["tipo"] == "categoria":
+            diccionarios[col] = Diccionario(cargar(col + ".texto"), cargar(col + ".desplazamientos"))
+    df = pd.DataFrame(datos, copy=False)
+    df.attrs["diccionarios"] = diccionarios
+    return df
+
+
+def tramos(df, filas_tramo):
+    """
+    Tramos de una tabla adjuntada con Fecha como datetime64 y las
+    categorías como texto, igual que en el CSV.
+    """
+    diccionarios = df.attrs.get("diccionarios", {})
+    for inicio in range(0, len(df), filas_tramo):
+        bloque = df.iloc[inicio:inicio + filas_tramo]
+        decodificadas = {
+            col: diccionario.decodificar(bloque[col].to_numpy())
+            for col, diccionario in diccionarios.items()
+        }
+        if "Fecha" in bloque.columns:
+            decodificadas["Fecha"] = dias_a_fechas(bloque["Fecha"].to_numpy())
+        if decodificadas:
+            bloque = bloque.assign(**decodificadas)
+        yield bloque
+
+
+def firma_archivos(*paths):
+    """Identifica el contenido de las fuentes por tamaño y fecha de modificación."""
+    firma = []
+    for path in paths:
+        estado = os.stat(path)
+        firma.append([os.path.abspath(path), estado.st_size, estado.st_mtime_ns])
+    return firma
+
+
+def cargar_compartido(directorio, firma, cargar):
+    """
+    Adjunta las tablas publicadas en `directorio`. El primer worker que
+    encuentra la publicación ausente o desactualizada llama a `cargar()`
+    (que devuelve un dict {tabla: DataFrame}) y la publica; el resto espera
+    el candado y sólo adjunta.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, ".candado"), "w") as candado:
+        fcntl.flock(candado, fcntl.LOCK_EX)
+        try:
+            with open(os.path.join(directorio, "tablas.json"), encoding="utf-8") as f:
+                tablas = json.load(f)
+        except (OSError, ValueError):
+            tablas = []
+
+        vigente = tablas and all(leer_firma(os.path.join(directorio, t)) == firma for t in tablas)
+        if not vigente:
+            fuentes = cargar()
+            for tabla, df in fuentes.items():
+                publicar(df, os.path.join(directorio, tabla), firma)
+            tablas = list(fuentes)
+            with open(os.path.join(directorio, "tablas.json"), "w", encoding="utf-8") as f:
+                json.dump(tablas, f)
+        fcntl.flock(candado, fcntl.LOCK_UN)
+
+    return {tabla: adjuntar(os.path.join(directorio, tabla)) for tabla in tablas}
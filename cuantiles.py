@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------------------------
+# CUANTILES APROXIMADOS (histogramas logarítmicos tipo DDSketch)
+# --------------------------------------------------------------------
+# Medianas y percentiles exactos exigen ordenar las filas crudas de cada
+# grupo en cada petición. En su lugar cada valor positivo se cuenta en la
+# cubeta ceil(log_γ(x)), con γ = (1 + α) / (1 - α): todo valor de una
+# cubeta está a menos de α (en términos relativos) de su representante.
+# Los conteos por cubeta son aditivos, así que se guardan como una tabla
+# más del cubo (dimensiones + Cubeta + Conteo), se unen sumando y
+# cualquier cuantil de cualquier combinación de grupos sale de recorrer
+# a lo sumo unas cientos de cubetas, sin importar cuántas filas haya.
+
+ERROR_RELATIVO = 0.01
+_GAMMA = (1 + ERROR_RELATIVO) / (1 - ERROR_RELATIVO)
+_LOG_GAMMA = np.log(_GAMMA)
+# Cubeta para los valores <= 0 (se representan con 0); queda antes que todas
+CUBETA_CERO = -(1 << 30)
+
+# Cuantiles de las vistas de percentiles y de caja
+PERCENTILES = {"p50": 0.5, "p90": 0.9}
+CAJA = {"Mínimo": 0.0, "p25": 0.25, "p50": 0.5, "p75": 0.75, "Máximo": 1.0}
+
+
+def cubetas(valores):
+    """Cubeta de cada valor (NaN para los faltantes)."""
+    x = pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy(dtype="float64")
+    cubeta = np.full(len(x), np.nan)
+    positivos = x > 0
+    cubeta[positivos] = np.ceil(np.log(x[positivos]) / _LOG_GAMMA)
+    cubeta[x <= 0] = CUBETA_CERO
+    return cubeta
+
+
+def representantes(cubeta):
+    """Valor que representa a cada cubeta (error relativo <= ERROR_RELATIVO)."""
+    cubeta = np.asarray(cubeta, dtype="float64")
+    return np.where(cubeta == CUBETA_CERO, 0.0, 2 * np.power(_GAMMA, cubeta) / (_GAMMA + 1))
+
+
+def agregar_cubetas(df, dimensiones, columna):
+    """Conteo por dimensiones x Cubeta de los valores de `columna`."""
+    df = df[dimensiones].assign(Cubeta=cubetas(df[columna]))
+    df = df[df["Cubeta"].notna()].astype({"Cubeta": "int64"})
+    return df.groupby(dimensiones + ["Cubeta"], dropna=False, sort=True, observed=True).size().rename("Conteo").reset_index()
+
+
+def sumar_cubetas(df, dimensiones):
+    """Suma histogramas (ya agregados) al grano dimensiones x Cubeta."""
+    return df.groupby(dimensiones + ["Cubeta"], dropna=False, sort=True, observed=True)["Conteo"].sum().reset_index()
+
+
+def cuantiles(tabla, claves, probabilidades):
+    """
+    Cuantiles aproximados por grupo de `claves` a partir de una tabla
+    claves + Cubeta + Conteo (puede traer varias filas por cubeta).
+    `probabilidades` es {nombre de columna: probabilidad}; el resultado
+    trae una columna por cuantil y el Conteo de valores del grupo.
+    """
+    columnas = claves + list(probabilidades) + ["Conteo"]
+    agrupado = tabla.groupby(claves + ["Cubeta"], observed=True, sort=True)["Conteo"].sum().reset_index()
+    agrupado = agrupado[agrupado["Conteo"] > 0]
+    if not len(agrupado):
+        return pd.DataFrame(columns=columnas)
+
+    # Al ordenar por claves + Cubeta, cada grupo queda contiguo y en orden de valor
+    grupos = agrupado.groupby(claves, observed=True, sort=False).ngroup().to_numpy()
+    conteos = agrupado["Conteo"].to_numpy(dtype="int64")
+    inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+    longitudes = np.diff(np.r_[inicios, len(grupos)])
+    acumulado = np.cumsum(conteos)
+    acumulado -= np.repeat(acumulado[inicios] - conteos[inicios], longitudes)
+    totales = np.add.reduceat(conteos, inicios)
+    valores = representantes(agrupado["Cubeta"].to_numpy())
+
+    resultado = agrupado.iloc[inicios][claves].reset_index(drop=True)
+    for nombre, probabilidad in probabilidades.items():
+        # Primera cubeta cuyo acumulado supera el rango p * (n - 1)
+        rango = np.repeat(probabilidad * (totales - 1), longitudes)
+        resultado[nombre] = valores[inicios + np.add.reduceat(acumulado <= rango, inicios)]
+    resultado["Conteo"] = totales
+    return resultado[columnas]
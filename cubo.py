@@ -0,0 +1,303 @@
+import pandas as pd
+
+from cuantiles import agregar_cubetas, cuantiles, sumar_cubetas
+from filtros import IndiceFiltro
+from metricas import etapa
+from reduccion import truncar_fechas
+from unicos import UnicosDiarios
+
+# --------------------------------------------------------------------
+# CUBO DIARIO DE PRE-AGREGADOS
+# --------------------------------------------------------------------
+# Las tres gráficas sólo necesitan sumas y conteos, así que en lugar de
+# recorrer las filas crudas en cada interacción se agregan una sola vez
+# por Fecha x Ubicación x Categoría x Evento (ventas) y por
+# Fecha x Ubicación (vistas). Todas las columnas son aditivas: cualquier
+# combinación de filtros se resuelve sumando grupos del cubo. Para los
+# cuantiles se guardan además histogramas logarítmicos (ver cuantiles.py)
+# de Satisfacción por Evento x Ubicación y de Tiempo de Visualización
+# por Fecha x Ubicación.
+
+DIMENSIONES_VENTAS = ["Fecha", "Ubicación", "Categoría", "Evento"]
+DIMENSIONES_VISTAS = ["Fecha", "Ubicación"]
+DIMENSIONES_SATISFACCION = ["Evento", "Ubicación"]
+DIMENSIONES_TIEMPO = ["Fecha", "Ubicación"]
+
+
+def _ancho(serie):
+    """Sube las columnas compactas (int8, float32...) a 64 bits antes de sumar."""
+    if pd.api.types.is_integer_dtype(serie.dtype):
+        return serie.astype("int64")
+    return pd.to_numeric(serie, errors="coerce").astype("float64")
+
+
+def agregar_ventas(df_ventas):
+    """Agrega las ventas crudas al grano del cubo."""
+    df = df_ventas[DIMENSIONES_VENTAS].copy()
+    df["Entradas Vendidas"] = _ancho(df_ventas["Entradas Vendidas"])
+    df["Total"] = _ancho(df_ventas["Total"])
+    df["Descuento"] = _ancho(df_ventas["Descuento"])
+    # El índice de rentabilidad es un promedio de razones por fila, por eso
+    # se guarda la suma de las razones y no sólo Total/Descuento.
+    indice = (df["Total"] - df["Descuento"]) / df["Total"]
+    df["Suma Índice"] = indice
+    df["Conteo Índice"] = indice.notna().astype("int64")
+    satisfaccion = _ancho(df_ventas["Satisfacción"])
+    df["Suma Satisfacción"] = satisfaccion
+    df["Conteo Satisfacción"] = satisfaccion.notna().astype("int64")
+
+    return sumar_ventas(df)
+
+
+def sumar_ventas(df):
+    """Suma filas (crudas o ya agregadas) al grano del cubo de ventas."""
+    return df.groupby(DIMENSIONES_VENTAS, dropna=False, sort=True, observed=True).sum(min_count=0).reset_index()
+
+
+def sumar_vistas(df):
+    """Suma filas (crudas o ya agregadas) al grano del cubo de vistas."""
+    return df.groupby(DIMENSIONES_VISTAS, dropna=False, sort=True, observed=True).sum().reset_index()
+
+
+def cubetas_satisfaccion(df_ventas):
+    return agregar_cubetas(df_ventas, DIMENSIONES_SATISFACCION, "Satisfacción")
+
+
+def cubetas_tiempo(df_vistas):
+    return agregar_cubetas(df_vistas, DIMENSIONES_TIEMPO, "Tiempo de Visualización")
+
+
+def _unicos(df_vistas):
+    if "ID Usuario" not in df_vistas.columns:
+        return None
+    return UnicosDiarios.desde_vistas(df_vistas)
+
+
+def agregar_vistas(df_vistas):
+    """Agrega las vistas crudas al grano del cubo."""
+    df = df_vistas[DIMENSIONES_VISTAS].copy()
+    df["Vistas"] = df_vistas["Tiempo de Visualización"].notna().astype("int64")
+
+    return sumar_vistas(df)
+
+
+class CuboDiario:
+    """
+    Pre-agregados diarios que responden a las consultas de los tres tabs.
+    El costo de cada consulta depende del número de días y dimensiones
+    distintas, no del número de transacciones.
+    """
+
+    def __init__(self, ventas, vistas, satisfaccion, tiempo, unicos=None):
+        self.ventas = ventas
+        self.vistas = vistas
+        # Histogramas para cuantiles (dimensiones + Cubeta + Conteo)
+        self.cubetas_satisfaccion = satisfaccion
+        self.cubetas_tiempo = tiempo
+        # Bocetos de usuarios únicos (None si las vistas no traen ID Usuario)
+        self.unicos = unicos
+        self.indice_ventas = IndiceFiltro(ventas, ["Ubicación", "Categoría", "Evento"])
+        self.indice_vistas = IndiceFiltro(vistas, ["Ubicación"])
+        self.indice_satisfaccion = IndiceFiltro(satisfaccion, DIMENSIONES_SATISFACCION)
+        self.indice_tiempo = IndiceFiltro(tiempo, ["Ubicación"])
+        # Valores de los controles del layout; el cubo no cambia (agregar
+        # devuelve uno nuevo), así que se calculan una vez y no en cada
+        # carga de página
+        fechas = ventas["Fecha"].dropna()
+        self._rango_fechas = (fechas.min(), fechas.max()) if len(fechas) else (None, None)
+        self._valores = {
+            col: sorted(ventas[col].dropna().unique().tolist()) for col in DIMENSIONES_VENTAS[1:]
+        }
+
+    @classmethod
+    def desde_tablas(cls, df_ventas, df_vistas):
+        return cls(
+            agregar_ventas(df_ventas), agregar_vistas(df_vistas),
+            cubetas_satisfaccion(df_ventas), cubetas_tiempo(df_vistas), _unicos(df_vistas),
+        )
+
+    @classmethod
+    def desde_bloques(cls, bloques_ventas, bloques_vistas):
+        """
+        Construye el cubo recorriendo las fuentes por bloques sin guardar
+        las filas crudas: la memoria depende del número de grupos, no del
+        número de filas.
+        """
+        ventas = satisfaccion = None
+        for bloque in bloques_ventas:
+            parcial = agregar_ventas(bloque)
+            ventas = parcial if ventas is None else sumar_ventas(pd.concat([ventas, parcial], ignore_index=True))
+            parcial = cubetas_satisfaccion(bloque)
+            satisfaccion = parcial if satisfaccion is None else sumar_cubetas(
+                pd.concat([satisfaccion, parcial], ignore_index=True), DIMENSIONES_SATISFACCION
+            )
+        vistas = tiempo = unicos = None
+        for bloque in bloques_vistas:
+            parcial = agregar_vistas(bloque)
+            vistas = parcial if vistas is None else sumar_vistas(pd.concat([vistas, parcial], ignore_index=True))
+            parcial = cubetas_tiempo(bloque)
+            tiempo = parcial if tiempo is None else sumar_cubetas(
+                pd.concat([tiempo, parcial], ignore_index=True), DIMENSIONES_TIEMPO
+            )
+            # Un bloque sin ID Usuario no aporta bocetos, pero no descarta
+            # los ya acumulados
+            bocetos = _unicos(bloque)
+            if bocetos is not None:
+                unicos = bocetos if unicos is None else unicos.unir(bocetos)
+        return cls(ventas, vistas, satisfaccion, tiempo, unicos)
+
+    def agregar(self, df_ventas=None, df_vistas=None):
+        """
+        Cubo nuevo con las filas crudas adicionales sumadas a sus grupos.
+        El cubo actual no se modifica, así que las consultas en curso no
+        ven un estado a medias.
+        """
+        ventas, vistas, unicos = self.ventas, self.vistas, self.unicos
+        satisfaccion, tiempo = self.cubetas_satisfaccion, self.cubetas_tiempo
+        if df_ventas is not None and len(df_ventas):
+            ventas = sumar_ventas(pd.concat([ventas, agregar_ventas(df_ventas)], ignore_index=True))
+            satisfaccion = sumar_cubetas(
+                pd.concat([satisfaccion, cubetas_satisfaccion(df_ventas)], ignore_index=True),
+                DIMENSIONES_SATISFACCION,
+            )
+        if df_vistas is not None and len(df_vistas):
+            vistas = sumar_vistas(pd.concat([vistas, agregar_vistas(df_vistas)], ignore_index=True))
+            tiempo = sumar_cubetas(
+                pd.concat([tiempo, cubetas_tiempo(df_vistas)], ignore_index=True), DIMENSIONES_TIEMPO
+            )
+            if unicos is not None:
+                unicos = unicos.agregar(df_vistas)
+        return CuboDiario(ventas, vistas, satisfaccion, tiempo, unicos)
+
+    # ----------------------------------------------------------------
+    # VALORES PARA LOS CONTROLES DEL LAYOUT
+    # ----------------------------------------------------------------
+    def rango_fechas(self):
+        """(primera, última) Fecha de ventas; (None, None) si no hay filas."""
+        return self._rango_fechas
+
+    def valores(self, columna):
+        """Valores distintos de una dimensión de ventas, ordenados."""
+        return list(self._valores[columna])
+
+    def hay_unicos(self):
+        """Si hay bocetos para `conversion_unicos` (las vistas traen ID Usuario)."""
+        return self.unicos is not None
+
+    def resumen(self):
+        """
+        Tablas que necesita el modo cliente: ventas por Fecha x Ubicación x
+        Categoría, vistas por Fecha x Ubicación y satisfacción por
+        Evento x Ubicación (sin fecha).
+        """
+        ventas = self.ventas.groupby(
+            ["Fecha", "Ubicación", "Categoría"], dropna=False, sort=True, observed=True
+        )[["Entradas Vendidas", "Suma Índice", "Conteo Índice"]].sum().reset_index()
+        satisfaccion = self.ventas.groupby(
+            ["Evento", "Ubicación"], dropna=False, sort=True, observed=True
+        )[["Suma Satisfacción", "Conteo Satisfacción"]].sum().reset_index()
+        return {"ventas": ventas, "vistas": self.vistas, "satisfaccion": satisfaccion}
+
+    # ----------------------------------------------------------------
+    # CONSULTAS
+    # ----------------------------------------------------------------
+    def conversion(self, start_date, end_date, ciudades, granularidad="D"):
+        """
+        Entradas y vistas por Fecha y Ubicación, con su tasa de conversión.
+        Con granularidad "W" o "M" la Fecha es el inicio de la semana o mes.
+        """
+        with etapa("filtrado", filas_entrada=len(self.ventas) + len(self.vistas)) as e:
+            ventas = self.indice_ventas.filtrar(start_date, end_date, {"Ubicación": ciudades})
+            vistas = self.indice_vistas.filtrar(start_date, end_date)
+            e.filas_salida = len(ventas) + len(vistas)
+        if granularidad != "D":
+            ventas = ventas.assign(Fecha=truncar_fechas(ventas["Fecha"], granularidad))
+            vistas = vistas.assign(Fecha=truncar_fechas(vistas["Fecha"], granularidad))
+
+        with etapa("groupby", filas_entrada=len(ventas) + len(vistas)) as e:
+            ventas_agrupadas = ventas.groupby(["Fecha", "Ubicación"], observed=True)["Entradas Vendidas"].sum().reset_index()
+            vistas_agrupadas = vistas.groupby(["Fecha", "Ubicación"], observed=True)["Vistas"].sum().reset_index()
+            e.filas_salida = len(ventas_agrupadas) + len(vistas_agrupadas)
+
+        with etapa("merge", filas_entrada=len(ventas_agrupadas) + len(vistas_agrupadas)) as e:
+            conversion = pd.merge(ventas_agrupadas, vistas_agrupadas, on=["Fecha", "Ubicación"], how="inner")
+            conversion["Tasa de Conversión"] = conversion["Entradas Vendidas"] / conversion["Vistas"]
+            e.filas_salida = len(conversion)
+        return conversion
+
+    def conversion_unicos(self, start_date, end_date, ciudades, granularidad="D"):
+        """
+        Entradas por usuario único: las entradas de las ciudades elegidas
+        sobre los usuarios distintos (estimados) que vieron en ellas cada
+        Fecha (día, semana o mes).
+        """
+        conversion = self.conversion(start_date, end_date, ciudades, granularidad)
+        with etapa("groupby", filas_entrada=len(conversion)) as e:
+            entradas = conversion.groupby("Fecha")["Entradas Vendidas"].sum().reset_index()
+            e.filas_salida = len(entradas)
+
+        with etapa("unicos", filas_entrada=len(self.unicos.claves)) as e:
+            unicos = self.unicos.consultar(start_date, end_date, ciudades, granularidad)
+            e.filas_salida = len(unicos)
+
+        df = pd.merge(entradas, unicos, on="Fecha", how="inner")
+        df["Tasa de Conversión"] = df["Entradas Vendidas"] / df["Usuarios Únicos"]
+        return df
+
+    def rentabilidad(self, start_date, end_date, categorias, ciudades, granularidad="D"):
+        """Índice de rentabilidad promedio por Fecha (día, semana o mes) y Categoría."""
+        with etapa("filtrado", filas_entrada=len(self.ventas)) as e:
+            ventas = self.indice_ventas.filtrar(
+                start_date, end_date, {"Categoría": categorias, "Ubicación": ciudades}
+            )
+            e.filas_salida = len(ventas)
+        if granularidad != "D":
+            ventas = ventas.assign(Fecha=truncar_fechas(ventas["Fecha"], granularidad))
+
+        with etapa("groupby", filas_entrada=len(ventas)) as e:
+            df_grouped = ventas.groupby(["Fecha", "Categoría"], observed=True)[["Suma Índice", "Conteo Índice"]].sum().reset_index()
+            df_grouped["Índice de Rentabilidad"] = df_grouped["Suma Índice"] / df_grouped["Conteo Índice"]
+            e.filas_salida = len(df_grouped)
+        return df_grouped
+
+    def satisfaccion(self, eventos, ciudades, por_ciudad):
+        """Satisfacción promedio por Evento (y Ubicación si `por_ciudad`)."""
+        with etapa("filtrado", filas_entrada=len(self.ventas)) as e:
+            ventas = self.indice_ventas.filtrar(selecciones={"Evento": eventos, "Ubicación": ciudades})
+            e.filas_salida = len(ventas)
+        claves = ["Evento", "Ubicación"] if por_ciudad else ["Evento"]
+
+        with etapa("groupby", filas_entrada=len(ventas)) as e:
+            df_grouped = ventas.groupby(claves, observed=True)[["Suma Satisfacción", "Conteo Satisfacción"]].sum().reset_index()
+            df_grouped = df_grouped[df_grouped["Conteo Satisfacción"] > 0]
+            df_grouped["Satisfacción"] = df_grouped["Suma Satisfacción"] / df_grouped["Conteo Satisfacción"]
+            e.filas_salida = len(df_grouped)
+        return df_grouped.reset_index(drop=True)
+
+    def cuantiles_satisfaccion(self, eventos, ciudades, probabilidades, por_ciudad=False):
+        """Cuantiles aproximados de Satisfacción por Evento (y Ubicación si `por_ciudad`)."""
+        with etapa("filtrado", filas_entrada=len(self.cubetas_satisfaccion)) as e:
+            cubetas = self.indice_satisfaccion.filtrar(selecciones={"Evento": eventos, "Ubicación": ciudades})
+            e.filas_salida = len(cubetas)
+        claves = ["Evento", "Ubicación"] if por_ciudad else ["Evento"]
+
+        with etapa("cuantiles", filas_entrada=len(cubetas)) as e:
+            df = cuantiles(cubetas, claves, probabilidades)
+            e.filas_salida = len(df)
+        return df
+
+    def cuantiles_tiempo(self, start_date, end_date, ciudades, probabilidades, por="Fecha", granularidad="D"):
+        """
+        Cuantiles aproximados de Tiempo de Visualización por Fecha (día,
+        semana o mes) o, con por="Ubicación", por ciudad en todo el rango.
+        """
+        with etapa("filtrado", filas_entrada=len(self.cubetas_tiempo)) as e:
+            cubetas = self.indice_tiempo.filtrar(start_date, end_date, {"Ubicación": ciudades})
+            e.filas_salida = len(cubetas)
+        if por == "Fecha" and granularidad != "D":
+            cubetas = cubetas.assign(Fecha=truncar_fechas(cubetas["Fecha"], granularidad))
+
+        with etapa("cuantiles", filas_entrada=len(cubetas)) as e:
+            df = cuantiles(cubetas, [por], probabilidades)
+            e.filas_salida = len(df)
+        return df
@@ -0,0 +1,146 @@
+import contextvars
+import functools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import dash
+from dash.exceptions import MissingCallbackContextException, PreventUpdate
+
+from cache_figuras import normalizar
+
+# --------------------------------------------------------------------
+# EJECUCIÓN EN SEGUNDO PLANO DE LOS CALLBACKS
+# --------------------------------------------------------------------
+# Al arrastrar el rango de fechas o marcar ciudades, Dash dispara una
+# ráfaga de peticiones y sólo importa la última. Los callbacks se
+# ejecutan en un pool de hilos acotado y:
+#   - una petición nueva de la misma página (Store "id-pagina", distinto
+#     en cada pestaña del navegador) para el mismo callback supera a la
+#     anterior: la anterior responde de inmediato sin actualizar la
+#     figura, y si nadie más espera ese cálculo se cancela (en la cola) o
+#     se abandona en la siguiente etapa;
+#   - peticiones idénticas concurrentes, aunque sean de usuarios
+#     distintos, comparten un solo cálculo (single-flight).
+
+# State que identifica a la página en el cuerpo de cada petición
+ESTADO_PAGINA = "id-pagina.data"
+
+_tarea_actual = contextvars.ContextVar("tarea_actual", default=None)
+
+
+class Cancelado(Exception):
+    """La tarea ya no tiene peticiones esperando su resultado."""
+
+
+def punto_de_control():
+    """Abandona la tarea en curso si todas sus peticiones fueron superadas."""
+    tarea = _tarea_actual.get()
+    if tarea is not None and tarea.interesados <= 0:
+        raise Cancelado(tarea.clave)
+
+
+class _Tarea:
+    def __init__(self, clave):
+        self.clave = clave
+        self.interesados = 0
+        self.future = None
+
+
+class _Espera:
+    """Una petición esperando el resultado de una tarea."""
+
+    def __init__(self, tarea):
+        self.tarea = tarea
+        self.superada = False
+        self.evento = threading.Event()
+
+
+class EjecutorCallbacks:
+    def __init__(self, hilos=4):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="callbacks")
+        self._candado = threading.Lock()
+        self._en_curso = {}  # clave de las entradas -> _Tarea
+        self._ultima = {}    # (página, callback) -> _Espera vigente
+
+    def _correr(self, tarea, funcion, args):
+        _tarea_actual.set(tarea)
+        punto_de_control()
+        return funcion(*args)
+
+    def _soltar(self, espera):
+        """
+        Descuenta una espera de su tarea. Sin interesados, la tarea sale de
+        las tareas en curso y se devuelve para cancelarla fuera del
+        candado. Requiere el candado.
+        """
+        tarea = espera.tarea
+        tarea.interesados -= 1
+        if tarea.interesados > 0:
+            return None
+        if self._en_curso.get(tarea.clave) is tarea:
+            del self._en_curso[tarea.clave]
+        return tarea
+
+    def ejecutar(self, nombre, funcion, args, pagina=None):
+        clave = json.dumps([nombre, [normalizar(a) for a in args]], default=str)
+        descartada = None
+        with self._candado:
+            tarea = self._en_curso.get(clave)
+            nueva = tarea is None
+            if nueva:
+                tarea = self._en_curso[clave] = _Tarea(clave)
+            tarea.interesados += 1
+            espera = _Espera(tarea)
+            if nueva:
+                # El hilo del pool hereda el contexto (callback en curso para las métricas)
+                contexto = contextvars.copy_context()
+                tarea.future = self._pool.submit(contexto.run, self._correr, tarea, funcion, args)
+
+            if pagina is not None:
+                anterior = self._ultima.get((pagina, nombre))
+                if anterior is not None and not anterior.superada:
+                    anterior.superada = True
+                    descartada = self._soltar(anterior)
+                    anterior.evento.set()
+                self._ultima[(pagina, nombre)] = espera
+
+        # Fuera del candado: cancelar un future, o registrar un callback en uno
+        # ya terminado, corre los callbacks aquí mismo y _terminar toma el candado
+        if descartada is not None:
+            descartada.future.cancel()
+        if nueva:
+            tarea.future.add_done_callback(functools.partial(self._terminar, tarea))
+        tarea.future.add_done_callback(lambda _: espera.evento.set())
+        espera.evento.wait()
+
+        with self._candado:
+            if pagina is not None and self._ultima.get((pagina, nombre)) is espera:
+                del self._ultima[(pagina, nombre)]
+            if espera.superada:
+                raise PreventUpdate
+            # La tarea ya terminó: no queda nada que cancelar
+            self._soltar(espera)
+        return tarea.future.result()
+
+    def _terminar(self, tarea, _future):
+        with self._candado:
+            if self._en_curso.get(tarea.clave) is tarea:
+                del self._en_curso[tarea.clave]
+
+    def en_segundo_plano(self, nombre):
+        """Decorador: el callback corre en el pool con superación y single-flight."""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args):
+                return self.ejecutar(nombre, funcion, args, pagina_actual())
+            return envoltura
+        return decorador
+
+
+def pagina_actual():
+    """Id de la página que disparó el callback en curso (None fuera de un callback)."""
+    try:
+        return dash.callback_context.states.get(ESTADO_PAGINA)
+    except MissingCallbackContextException:
+        return None
@@ -0,0 +1,158 @@
+import tempfile
+import threading
+
+import flask
+import pandas as pd
+from openpyxl import Workbook
+
+# --------------------------------------------------------------------
+# EXPORTACIÓN DE LAS FILAS DETRÁS DE CADA GRÁFICA
+# --------------------------------------------------------------------
+# /exportar/<pestaña>/<tabla>.<csv|xlsx> devuelve las filas crudas con
+# los mismos filtros que el callback de la pestaña, p. ej.
+#
+#   /exportar/rentabilidad/ventas.xlsx?inicio=2024-01-01&fin=2024-03-31
+#       &categorias=Teatro&ciudades=Quito&ciudades=Manta
+#
+# Un filtro que no viene en la URL no restringe nada. Las filas llegan
+# por bloques y se escriben a medida que se leen: el CSV se envía bloque
+# a bloque y el XLSX se escribe con openpyxl en modo write_only a un
+# archivo temporal que luego se envía por partes. Así ninguna exportación
+# queda entera en memoria, y un tope de exportaciones simultáneas por
+# worker deja hilos libres para el dashboard.
+
+# Tabla -> columnas filtrables, según la pestaña (ver los callbacks de app.py)
+FILTROS_PESTANAS = {
+    "conversion": {"ventas": ["Fecha", "Ubicación"], "vistas": ["Fecha", "Ubicación"]},
+    "rentabilidad": {"ventas": ["Fecha", "Categoría", "Ubicación"]},
+    "satisfaccion": {"ventas": ["Evento", "Ubicación"]},
+}
+# Columna -> parámetro de la URL (repetible)
+PARAMETROS = {"Ubicación": "ciudades", "Categoría": "categorias", "Evento": "eventos"}
+
+# Excel admite 1.048.576 filas por hoja, incluido el encabezado
+FILAS_HOJA = 1_048_575
+BYTES_PARTE = 1 << 20
+
+
+def leer_filtros(args, columnas):
+    """(start_date, end_date, selecciones) desde los parámetros de la URL."""
+    start_date = end_date = None
+    if "Fecha" in columnas:
+        start_date = args.get("inicio") or None
+        end_date = args.get("fin") or None
+        for fecha in (start_date, end_date):
+            if fecha is not None:
+                try:
+                    pd.Timestamp(fecha)
+                except ValueError:
+                    flask.abort(400, f"Fecha inválida: {fecha}")
+    selecciones = {
+        col: args.getlist(PARAMETROS[col])
+        for col in columnas
+        if col in PARAMETROS and PARAMETROS[col] in args
+    }
+    return start_date, end_date, selecciones
+
+
+def filtrar_bloques(bloques, start_date=None, end_date=None, selecciones=None):
+    """Aplica a cada bloque los mismos filtros que los callbacks."""
+    for bloque in bloques:
+        mascara = pd.Series(True, index=bloque.index)
+        if start_date is not None:
+            mascara &= bloque["Fecha"] >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mascara &= bloque["Fecha"] <= pd.Timestamp(end_date)
+        for col, valores in (selecciones or {}).items():
+            mascara &= bloque[col].isin(valores)
+        yield bloque[mascara]
+
+
+def csv_por_partes(bloques):
+    encabezado = True
+    for bloque in bloques:
+        if encabezado or len(bloque):
+            yield bloque.to_csv(index=False, header=encabezado).encode("utf-8")
+            encabezado = False
+
+
+def _filas_excel(bloque):
+    """Filas de `bloque` con tipos que openpyxl sabe escribir (fechas sin hora, None para faltantes)."""
+    bloque = bloque.copy()
+    for col in bloque.columns:
+        if pd.api.types.is_datetime64_any_dtype(bloque[col]):
+            bloque[col] = bloque[col].dt.date
+    bloque = bloque.astype(object).where(bloque.notna(), None)
+    return bloque.itertuples(index=False, name=None)
+
+
+def xlsx_por_partes(bloques, nombre_hoja):
+    with tempfile.TemporaryFile(suffix=".xlsx") as archivo:
+        libro = Workbook(write_only=True)
+        hoja = columnas = None
+        hojas = filas_hoja = 0
+        for bloque in bloques:
+            columnas = list(bloque.columns)
+            for fila in _filas_excel(bloque):
+                if hoja is None or filas_hoja >= FILAS_HOJA:
+                    hojas += 1
+                    hoja = libro.create_sheet(nombre_hoja if hojas == 1 else f"{nombre_hoja} {hojas}")
+                    hoja.append(columnas)
+                    filas_hoja = 0
+                hoja.append(fila)
+                filas_hoja += 1
+        if hoja is None:
+            # Sin filas: una hoja con sólo el encabezado (si se conoce)
+            hoja = libro.create_sheet(nombre_hoja)
+            if columnas:
+                hoja.append(columnas)
+        libro.save(archivo)
+
+        archivo.seek(0)
+        for parte in iter(lambda: archivo.read(BYTES_PARTE), b""):
+            yield parte
+
+
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", lambda bloques, tabla: csv_por_partes(bloques)),
+    "xlsx": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        xlsx_por_partes,
+    ),
+}
+
+
+def registrar_exportacion(server, bloques, simultaneas=2, ruta="/exportar"):
+    """
+    `bloques(tabla, start_date, end_date, selecciones)` devuelve un
+    iterador de DataFrames ya filtrados con las filas crudas de la tabla.
+    """
+    cupos = threading.BoundedSemaphore(simultaneas)
+
+    @server.route(ruta + "/<pestana>/<tabla>.<formato>")
+    def exportar(pestana, tabla, formato):
+        columnas = FILTROS_PESTANAS.get(pestana, {}).get(tabla)
+        if columnas is None or formato not in FORMATOS:
+            flask.abort(404)
+        start_date, end_date, selecciones = leer_filtros(flask.request.args, columnas)
+
+        if not cupos.acquire(blocking=False):
+            return flask.Response(
+                "Demasiadas exportaciones en curso, reintente en unos segundos.\n",
+                status=503, mimetype="text/plain; charset=utf-8", headers={"Retry-After": "10"},
+            )
+        try:
+            mimetype, escribir = FORMATOS[formato]
+            respuesta = flask.Response(
+                escribir(bloques(tabla, start_date, end_date, selecciones), tabla),
+                mimetype=mimetype,
+                headers={"Content-Disposition": f'attachment; filename="{pestana}_{tabla}.{formato}"'},
+            )
+        except BaseException:
+            cupos.release()
+            raise
+        # El cupo se libera cuando termina el envío (o el cliente corta)
+        respuesta.call_on_close(cupos.release)
+        return respuesta
+
+    return exportar
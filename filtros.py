@@ -0,0 +1,76 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------------------------
+# MOTOR DE FILTRADO
+# --------------------------------------------------------------------
+# Los filtros de los callbacks comparaban cada fila contra la fecha de
+# inicio, la de fin y cada lista de selección: O(n) por predicado en cada
+# petición. Aquí las filas se ordenan una sola vez por Fecha, la ventana
+# de fechas se encuentra con búsqueda binaria y cada dimensión se guarda
+# como códigos enteros; una selección del dropdown se traduce a una tabla
+# de bits indexada por código, así que sólo se recorre el tramo de fechas.
+
+
+class IndiceFiltro:
+    """Índice de sólo lectura sobre `df` para filtrar por Fecha y dimensiones."""
+
+    def __init__(self, df, dimensiones):
+        if "Fecha" in df.columns:
+            df = df.sort_values("Fecha", kind="stable", na_position="last")
+            fechas = df["Fecha"].to_numpy(dtype="datetime64[ns]")
+            # Las filas sin fecha quedan al final y fuera de cualquier ventana
+            self.n_con_fecha = int((~np.isnat(fechas)).sum())
+            self.fechas = fechas[:self.n_con_fecha]
+        else:
+            self.n_con_fecha = len(df)
+            self.fechas = None
+        self.df = df
+
+        self.codigos = {}
+        self.categorias = {}
+        for col in dimensiones:
+            codigos, categorias = pd.factorize(df[col])
+            self.codigos[col] = codigos
+            self.categorias[col] = categorias
+        self._bits = lru_cache(maxsize=256)(self._calcular_bits)
+
+    def _calcular_bits(self, col, seleccion):
+        # Una posición extra al final para el código -1 (valor faltante)
+        bits = np.zeros(len(self.categorias[col]) + 1, dtype=bool)
+        posiciones = self.categorias[col].get_indexer(list(seleccion))
+        bits[posiciones[posiciones >= 0]] = True
+        return bits
+
+    def tramo(self, start_date=None, end_date=None):
+        """Posiciones [inicio, fin) de las filas con start_date <= Fecha <= end_date."""
+        if start_date is None and end_date is None:
+            return 0, len(self.df)
+        inicio = 0
+        fin = self.n_con_fecha
+        if start_date is not None:
+            inicio = int(np.searchsorted(self.fechas, pd.Timestamp(start_date).to_datetime64(), side="left"))
+        if end_date is not None:
+            fin = int(np.searchsorted(self.fechas, pd.Timestamp(end_date).to_datetime64(), side="right"))
+        return inicio, max(inicio, fin)
+
+    def mascara(self, selecciones, inicio, fin):
+        mascara = None
+        for col, seleccion in selecciones.items():
+            bits = self._bits(col, tuple(sorted(set(seleccion or ()), key=str)))
+            parcial = bits[self.codigos[col][inicio:fin]]
+            mascara = parcial if mascara is None else mascara & parcial
+        return mascara
+
+    def filtrar(self, start_date=None, end_date=None, selecciones=None):
+        """
+        Filas con la Fecha en la ventana y cada dimensión de `selecciones`
+        ({columna: valores}) dentro de los valores elegidos.
+        """
+        inicio, fin = self.tramo(start_date, end_date)
+        tramo = self.df.iloc[inicio:fin]
+        if not selecciones:
+            return tramo
+        return tramo[self.mascara(selecciones, inicio, fin)]
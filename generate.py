@@ -1,42 +1,132 @@
+import argparse
+
+import numpy as np
 import pandas as pd
-import random
-import datetime
-
-# Generar datos sintéticos para ventas
-eventos = ["Concierto A", "Obra de Teatro B", "Feria C", "Conferencia D", "Exposición E"]
-categorias = ["Música", "Teatro", "Cultura", "Educación", "Arte"]
-ubicaciones = ["Manta", "Guayaquil", "Cuenca", "Quito", "Ambato"]
-
-# Crear dataset
-data_ventas = []
-for i in range(500):  # Generar 500 filas de datos
-    fecha = datetime.date(2024, random.randint(1, 12), random.randint(1, 28))
-    evento = random.choice(eventos)
-    categoria = categorias[eventos.index(evento)]
-    entradas_vendidas = random.randint(1, 10)
-    ubicacion = random.choice(ubicaciones)
-    satisfaccion = round(random.uniform(3, 5), 1)  # Escala de 1 a 5
-    total = round(entradas_vendidas * random.uniform(20, 100), 2)  # Total en USD
-    descuento = round(total * random.uniform(0.05, 0.3), 2)  # Descuento aplicado
-    
-    data_ventas.append([fecha, evento, categoria, entradas_vendidas, ubicacion, satisfaccion, total, descuento])
-
-df_ventas = pd.DataFrame(data_ventas, columns=["Fecha", "Evento", "Categoría", "Entradas Vendidas", "Ubicación", "Satisfacción", "Total", "Descuento"])
-
-df_ventas.to_csv("ventas_eventos.csv", index=False)
-print("Archivo ventas_eventos.csv generado.")
-
-
-# Generar datos sintéticos para vistas
-data_vistas = []
-for i in range(1000):  # Generar 1000 filas de datos
-    fecha = datetime.date(2024, random.randint(1, 12), random.randint(1, 28))
-    id_usuario = f"user_{random.randint(1, 300)}"
-    tiempo_visualizacion = random.randint(1, 300)  # En segundos
-    ubicacion = random.choice(ubicaciones)
-
-    data_vistas.append([fecha, id_usuario, tiempo_visualizacion, ubicacion])
-
-df_vistas = pd.DataFrame(data_vistas, columns=["Fecha", "ID Usuario", "Tiempo de Visualización", "Ubicación"])
-df_vistas.to_csv("vistas_eventos.csv", index=False)
-print("Archivo vistas_eventos.csv generado.")
+
+# --------------------------------------------------------------------
+# GENERADOR DE DATOS SINTÉTICOS
+# --------------------------------------------------------------------
+# Genera ventas_eventos.csv y vistas_eventos.csv con muestreo vectorizado
+# de NumPy y semilla fija, escribiendo por bloques para que la memoria no
+# dependa del número de filas. Sirve tanto para los datos de ejemplo
+# (valores por defecto) como para pruebas de carga con cientos de
+# millones de filas.
+#
+#   python generate.py
+#   python generate.py --ventas 50000000 --vistas 200000000 --eventos 400 \
+#       --ciudades 40 --usuarios 5000000 --dias 1095 --sesgo 1.1
+
+EVENTOS_BASE = ["Concierto A", "Obra de Teatro B", "Feria C", "Conferencia D", "Exposición E"]
+CATEGORIAS_BASE = ["Música", "Teatro", "Cultura", "Educación", "Arte"]
+UBICACIONES_BASE = ["Manta", "Guayaquil", "Cuenca", "Quito", "Ambato"]
+
+COLUMNAS_VENTAS = ["Fecha", "Evento", "Categoría", "Entradas Vendidas", "Ubicación", "Satisfacción", "Total", "Descuento"]
+COLUMNAS_VISTAS = ["Fecha", "ID Usuario", "Tiempo de Visualización", "Ubicación"]
+
+
+def nombres(base, cantidad, prefijo):
+    """Los nombres de ejemplo y, si se piden más, nombres numerados."""
+    return (base + [f"{prefijo} {i}" for i in range(len(base) + 1, cantidad + 1)])[:cantidad]
+
+
+def pesos_zipf(cantidad, sesgo):
+    """Probabilidades proporcionales a 1/k^sesgo (sesgo=0 es uniforme)."""
+    pesos = 1.0 / np.arange(1, cantidad + 1) ** sesgo
+    return pesos / pesos.sum()
+
+
+class Config:
+    def __init__(self, eventos=5, ciudades=5, usuarios=300, dias=366, inicio="2024-01-01", sesgo=0.0):
+        self.eventos = np.array(nombres(EVENTOS_BASE, eventos, "Evento"), dtype=object)
+        # Cada evento pertenece siempre a la misma categoría
+        self.categorias = np.array(
+            [CATEGORIAS_BASE[i % len(CATEGORIAS_BASE)] for i in range(eventos)], dtype=object
+        )
+        self.ubicaciones = np.array(nombres(UBICACIONES_BASE, ciudades, "Ciudad"), dtype=object)
+        self.usuarios = usuarios
+        self.dias = dias
+        self.inicio = np.datetime64(inicio, "D")
+        self.p_eventos = pesos_zipf(eventos, sesgo)
+        self.p_ubicaciones = pesos_zipf(ciudades, sesgo)
+        self.sesgo = sesgo
+
+
+def _fechas(rng, n, config):
+    return config.inicio + rng.integers(0, config.dias, n)
+
+
+def generar_ventas(rng, n, config):
+    """Un bloque de `n` filas de ventas."""
+    evento = rng.choice(len(config.eventos), size=n, p=config.p_eventos)
+    entradas = rng.integers(1, 11, n)
+    total = np.round(entradas * rng.uniform(20, 100, n), 2)
+    return pd.DataFrame({
+        "Fecha": _fechas(rng, n, config),
+        "Evento": config.eventos[evento],
+        "Categoría": config.categorias[evento],
+        "Entradas Vendidas": entradas,
+        "Ubicación": config.ubicaciones[rng.choice(len(config.ubicaciones), size=n, p=config.p_ubicaciones)],
+        "Satisfacción": np.round(rng.uniform(3, 5, n), 1),  # Escala de 1 a 5
+        "Total": total,  # Total en USD
+        "Descuento": np.round(total * rng.uniform(0.05, 0.3, n), 2),  # Descuento aplicado
+    }, columns=COLUMNAS_VENTAS)
+
+
+def generar_vistas(rng, n, config):
+    """Un bloque de `n` filas de vistas."""
+    if config.sesgo > 0:
+        # Zipf sobre los IDs: pocos usuarios concentran muchas vistas
+        usuario = (rng.zipf(1 + config.sesgo, n) - 1) % config.usuarios + 1
+    else:
+        usuario = rng.integers(1, config.usuarios + 1, n)
+    return pd.DataFrame({
+        "Fecha": _fechas(rng, n, config),
+        "ID Usuario": np.char.add("user_", usuario.astype(str)),
+        "Tiempo de Visualización": rng.integers(1, 301, n),  # En segundos
+        "Ubicación": config.ubicaciones[rng.choice(len(config.ubicaciones), size=n, p=config.p_ubicaciones)],
+    }, columns=COLUMNAS_VISTAS)
+
+
+def escribir(path, generar, filas, rng, config, bloque=1_000_000):
+    """Escribe `filas` filas en `path` generando bloques de `bloque` filas."""
+    # El primer bloque crea el archivo con el encabezado (aunque filas sea 0)
+    escritas = min(bloque, filas)
+    generar(rng, escritas, config).to_csv(path, index=False)
+    while escritas < filas:
+        n = min(bloque, filas - escritas)
+        generar(rng, n, config).to_csv(path, index=False, mode="a", header=False)
+        escritas += n
+    return escritas
+
+
+def generar_archivos(path_ventas, path_vistas, filas_ventas, filas_vistas, config, semilla=0, bloque=1_000_000):
+    # Un flujo aleatorio independiente por archivo: cambiar el tamaño de
+    # uno no cambia el contenido del otro
+    rng_ventas, rng_vistas = (np.random.default_rng(s) for s in np.random.SeedSequence(semilla).spawn(2))
+    escribir(path_ventas, generar_ventas, filas_ventas, rng_ventas, config, bloque)
+    escribir(path_vistas, generar_vistas, filas_vistas, rng_vistas, config, bloque)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos de ventas y vistas de eventos.")
+    parser.add_argument("--ventas", type=int, default=500, help="filas de ventas")
+    parser.add_argument("--vistas", type=int, default=1000, help="filas de vistas")
+    parser.add_argument("--eventos", type=int, default=5)
+    parser.add_argument("--ciudades", type=int, default=5)
+    parser.add_argument("--usuarios", type=int, default=300)
+    parser.add_argument("--dias", type=int, default=366, help="días desde --inicio")
+    parser.add_argument("--inicio", default="2024-01-01")
+    parser.add_argument("--sesgo", type=float, default=0.0,
+                        help="exponente Zipf para eventos, ciudades y usuarios (0 = uniforme)")
+    parser.add_argument("--semilla", type=int, default=0, help="misma semilla y --bloque, mismos archivos")
+    parser.add_argument("--bloque", type=int, default=1_000_000, help="filas generadas por bloque")
+    parser.add_argument("--salida-ventas", default="ventas_eventos.csv")
+    parser.add_argument("--salida-vistas", default="vistas_eventos.csv")
+    args = parser.parse_args()
+
+    config = Config(args.eventos, args.ciudades, args.usuarios, args.dias, args.inicio, args.sesgo)
+    generar_archivos(
+        args.salida_ventas, args.salida_vistas, args.ventas, args.vistas, config, args.semilla, args.bloque
+    )
+    print(f"Archivo {args.salida_ventas} generado.")
+    print(f"Archivo {args.salida_vistas} generado.")
@@ -0,0 +1,198 @@
+import io
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------------------------
+# INGESTA INCREMENTAL DE LOS CSV
+# --------------------------------------------------------------------
+# Los CSV se leían una sola vez al importar la app. Aquí cada archivo
+# tiene un seguidor que recuerda hasta qué byte ya se procesó; al revisar
+# sólo se parsea el tramo nuevo (hasta el último salto de línea completo)
+# y las filas se entregan a quien mantiene las tablas y agregados.
+
+
+class _Tramo(io.RawIOBase):
+    """Archivo de sólo lectura: `prefijo` seguido de los bytes [inicio, fin) de `f`."""
+
+    def __init__(self, prefijo, f, inicio, fin):
+        self.prefijo = prefijo
+        self.f = f
+        self.f.seek(inicio)
+        self.restante = fin - inicio
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefijo:
+            n = min(len(buffer), len(self.prefijo))
+            buffer[:n] = self.prefijo[:n]
+            self.prefijo = self.prefijo[n:]
+            return n
+        n = min(len(buffer), self.restante)
+        if n <= 0:
+            return 0
+        datos = self.f.read(n)
+        buffer[:len(datos)] = datos
+        self.restante -= len(datos)
+        return len(datos)
+
+
+class SeguidorCSV:
+    """Lee un CSV que sólo crece, entregando cada vez las filas nuevas."""
+
+    def __init__(self, path, parse_dates=("Fecha",)):
+        self.path = path
+        self.parse_dates = list(parse_dates)
+        self.offset = 0
+        self.encabezado = b""
+        self.identidad = None
+        self.reiniciado = False
+
+    def _fin_de_linea(self, f, tamano):
+        """Posición justo después del último '\\n' antes de `tamano`."""
+        bloque = 64 * 1024
+        pos = tamano
+        while pos > self.offset:
+            inicio = max(self.offset, pos - bloque)
+            f.seek(inicio)
+            datos = f.read(pos - inicio)
+            salto = datos.rfind(b"\n")
+            if salto >= 0:
+                return inicio + salto + 1
+            pos = inicio
+        return self.offset
+
+    def reemplazado(self):
+        """Si el archivo se reemplazó o truncó desde la última lectura (sin leerlo)."""
+        estado = os.stat(self.path)
+        return self.identidad is not None and (
+            (estado.st_dev, estado.st_ino) != self.identidad or estado.st_size < self.offset
+        )
+
+    def leer_bloques(self, filas_bloque=None, usecols=None):
+        """
+        Generador con las filas nuevas en DataFrames de hasta `filas_bloque`
+        filas (todas juntas si es None). El offset avanza al agotarlo;
+        `self.reiniciado` indica si el archivo se reemplazó o truncó y las
+        filas son el archivo completo. Al leer desde el inicio un archivo
+        sin filas se entrega un DataFrame vacío con sus columnas.
+        """
+        self.reiniciado = self.reemplazado()
+        estado = os.stat(self.path)
+        desde_inicio = self.reiniciado or self.identidad is None
+        if desde_inicio:
+            self.offset = 0
+            self.encabezado = b""
+        self.identidad = (estado.st_dev, estado.st_ino)
+
+        with open(self.path, "rb") as f:
+            if not self.encabezado:
+                self.encabezado = f.readline()
+                if not self.encabezado.endswith(b"\n"):
+                    self.encabezado = b""
+                    return
+                self.offset = len(self.encabezado)
+            fin = self._fin_de_linea(f, estado.st_size)
+            if fin <= self.offset:
+                if desde_inicio:
+                    yield pd.read_csv(io.BytesIO(self.encabezado), parse_dates=self.parse_dates, usecols=usecols)
+                return
+            tramo = io.BufferedReader(_Tramo(self.encabezado, f, self.offset, fin))
+            lector = pd.read_csv(tramo, parse_dates=self.parse_dates, usecols=usecols, chunksize=filas_bloque)
+            if filas_bloque is None:
+                yield lector
+            else:
+                yield from lector
+        self.offset = fin
+
+    def leer_nuevas(self):
+        """Devuelve (filas_nuevas, reiniciado); filas_nuevas es None si no hay."""
+        bloques = list(self.leer_bloques())
+        return (bloques[0] if bloques else None), self.reiniciado
+
+
+class IngestaIncremental:
+    """
+    Revisa periódicamente los seguidores y llama a `al_actualizar(nuevas,
+    reiniciado)` con {tabla: DataFrame} cuando aparecen filas nuevas. Si
+    se da `al_reiniciar()`, cuando un archivo se reemplaza se llama a ella
+    en lugar de entregar las tablas completas: quien la da vuelve a leer
+    los seguidores (p. ej. por bloques con `leer_bloques`).
+    """
+
+    def __init__(self, seguidores, al_actualizar, al_reiniciar=None):
+        self.seguidores = seguidores
+        self.al_actualizar = al_actualizar
+        self.al_reiniciar = al_reiniciar
+        self._candado = threading.Lock()
+        self._version = None
+
+    def _leer_todo(self):
+        for seguidor in self.seguidores.values():
+            seguidor.identidad = None
+        return {tabla: seguidor.leer_nuevas()[0] for tabla, seguidor in self.seguidores.items()}
+
+    def cargar_inicial(self):
+        with self._candado:
+            return self._leer_todo()
+
+    def publicar_version(self):
+        """
+        Fija la versión en los bytes leídos hasta ahora. Quien mantiene los
+        agregados la llama cuando ya reemplazó los suyos: los seguidores
+        avanzan al leer, antes de que las filas estén incorporadas.
+        """
+        self._version = [[s.path, s.identidad, s.offset] for s in self.seguidores.values()]
+
+    def version(self):
+        """Bytes ya incorporados de cada archivo; identifica los datos en memoria."""
+        return self._version
+
+    def _recargar(self):
+        if self.al_reiniciar is not None:
+            for seguidor in self.seguidores.values():
+                seguidor.identidad = None
+            self.al_reiniciar()
+            return {}
+        completas = self._leer_todo()
+        self.al_actualizar(completas, True)
+        return completas
+
+    def revisar(self):
+        with self._candado:
+            nuevas = {}
+            for tabla, seguidor in self.seguidores.items():
+                # Un archivo se reemplazó: se recargan todas las tablas desde
+                # cero (se revisa antes de leer, para no leerlo entero aquí)
+                if seguidor.reemplazado():
+                    return self._recargar()
+                df, reiniciado = seguidor.leer_nuevas()
+                if reiniciado:
+                    return self._recargar()
+                if df is not None:
+                    # Se entrega tabla por tabla para no perder filas ya leídas
+                    # si el siguiente archivo falla a mitad de camino
+                    self.al_actualizar({tabla: df}, False)
+                    nuevas[tabla] = df
+            return nuevas
+
+    def iniciar(self, intervalo):
+        """Hilo de fondo que llama a `revisar()` cada `intervalo` segundos."""
+        def ciclo():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.revisar()
+                except Exception:  # el hilo no debe morir por un CSV a medio escribir
+                    logger.exception("Ingesta incremental: falló la revisión de los CSV")
+
+        hilo = threading.Thread(target=ciclo, name="ingesta-incremental", daemon=True)
+        hilo.start()
+        return hilo
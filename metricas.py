@@ -0,0 +1,155 @@
+import contextvars
+import functools
+import threading
+import time
+
+import flask
+
+from ejecucion import punto_de_control
+
+# --------------------------------------------------------------------
+# MÉTRICAS DE LA RUTA CRÍTICA (formato Prometheus)
+# --------------------------------------------------------------------
+# Cada callback se divide en etapas (filtrado, groupby, merge, figura y
+# serialización) y cada etapa registra su duración y las filas que entran
+# y salen en histogramas. La ruta /metrics los expone en el formato de
+# texto de Prometheus. Cada worker de gunicorn lleva sus propios
+# contadores; Prometheus los suma al raspar cada proceso.
+
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LIMITES_FILAS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+_callback_actual = contextvars.ContextVar("callback_actual", default="ninguno")
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas, limites):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.limites = limites
+        self._series = {}
+        self._candado = threading.Lock()
+
+    def observar(self, valor, *valores_etiquetas):
+        with self._candado:
+            serie = self._series.get(valores_etiquetas)
+            if serie is None:
+                serie = self._series[valores_etiquetas] = [[0] * len(self.limites), 0.0, 0]
+            cubetas = serie[0]
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    cubetas[i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._candado:
+            series = {clave: (list(c), s, n) for clave, (c, s, n) in self._series.items()}
+        for valores_etiquetas, (cubetas, suma, cuenta) in sorted(series.items()):
+            etiquetas = ",".join(
+                f'{nombre}="{valor}"' for nombre, valor in zip(self.etiquetas, valores_etiquetas)
+            )
+            separador = "," if etiquetas else ""
+            for limite, acumulado in zip(self.limites, cubetas):
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas}{separador}le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{etiquetas}{separador}le="+Inf"}} {cuenta}')
+            lineas.append(f"{self.nombre}_sum{{{etiquetas}}} {suma}")
+            lineas.append(f"{self.nombre}_count{{{etiquetas}}} {cuenta}")
+        return lineas
+
+
+SEGUNDOS = Histograma(
+    "dash_eventos_etapa_segundos", "Duración de cada etapa de los callbacks y del arranque.",
+    ("callback", "etapa"), LIMITES_SEGUNDOS,
+)
+FILAS_ENTRADA = Histograma(
+    "dash_eventos_etapa_filas_entrada", "Filas que recibe cada etapa.",
+    ("callback", "etapa"), LIMITES_FILAS,
+)
+FILAS_SALIDA = Histograma(
+    "dash_eventos_etapa_filas_salida", "Filas que produce cada etapa.",
+    ("callback", "etapa"), LIMITES_FILAS,
+)
+HISTOGRAMAS = (SEGUNDOS, FILAS_ENTRADA, FILAS_SALIDA)
+
+
+class etapa:
+    """
+    Mide un bloque como etapa del callback en curso:
+
+        with etapa("groupby", filas_entrada=len(df)) as e:
+            agrupado = ...
+            e.filas_salida = len(agrupado)
+    """
+
+    def __init__(self, nombre, filas_entrada=None, callback=None):
+        self.nombre = nombre
+        self.callback = callback
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+
+    def __enter__(self):
+        # Entre etapas, una tarea en segundo plano ya superada se abandona
+        punto_de_control()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracion = time.perf_counter() - self._inicio
+        callback = self.callback or _callback_actual.get()
+        SEGUNDOS.observar(duracion, callback, self.nombre)
+        if self.filas_entrada is not None:
+            FILAS_ENTRADA.observar(self.filas_entrada, callback, self.nombre)
+        if self.filas_salida is not None:
+            FILAS_SALIDA.observar(self.filas_salida, callback, self.nombre)
+        return False
+
+
+def instrumentar(nombre):
+    """
+    Decorador para los callbacks: fija el nombre con que se etiquetan sus
+    etapas y mide el total. La serialización ocurre después, dentro de
+    Dash, y la mide `registrar_serializacion` al cerrar la petición.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args):
+            token = _callback_actual.set(nombre)
+            try:
+                with etapa("total"):
+                    resultado = funcion(*args)
+            finally:
+                _callback_actual.reset(token)
+            if flask.has_request_context():
+                flask.g.metricas_callback = (nombre, time.perf_counter())
+            return resultado
+        return envoltura
+    return decorador
+
+
+def registrar_serializacion(respuesta):
+    """`after_request` de Flask: tiempo desde que terminó el callback hasta la respuesta."""
+    marca = flask.g.pop("metricas_callback", None)
+    if marca is not None:
+        nombre, fin_callback = marca
+        SEGUNDOS.observar(time.perf_counter() - fin_callback, nombre, "serializacion")
+    return respuesta
+
+
+def exponer():
+    lineas = []
+    for histograma in HISTOGRAMAS:
+        lineas.extend(histograma.exponer())
+    return "\n".join(lineas) + "\n"
+
+
+def registrar_ruta(server, ruta="/metrics"):
+    server.after_request(registrar_serializacion)
+
+    @server.route(ruta)
+    def metricas():
+        return flask.Response(exponer(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    return metricas
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------------------------
+# REDUCCIÓN DE SERIES DE TIEMPO LARGAS
+# --------------------------------------------------------------------
+# Las gráficas de líneas enviaban todos los puntos al navegador. Con
+# varios años de historia se reduce en el servidor en dos pasos:
+#   1. Si el rango tiene muchos más días que píxeles, se agrupa por
+#      semana o por mes (las sumas del cubo permiten hacerlo sin perder
+#      exactitud en las tasas).
+#   2. Cada serie se reduce con LTTB (Largest-Triangle-Three-Buckets) al
+#      presupuesto de puntos, que conserva picos y forma.
+# Si aun así la figura tiene muchos puntos se dibuja con WebGL.
+
+ANCHO_DEFECTO = 1200
+# El ancho lo manda el navegador: se acota para que ningún valor
+# desactive la reducción (una pantalla 4K como máximo)
+ANCHO_MAXIMO = 3840
+# La gráfica ocupa 10 de las 12 columnas del layout
+FRACCION_GRAFICO = 10 / 12
+PUNTOS_MINIMOS = 200
+# Se toleran hasta FACTOR_LTTB x presupuesto puntos diarios antes de
+# cambiar a semanas o meses; LTTB se encarga del resto
+FACTOR_LTTB = 4
+PUNTOS_WEBGL = 2000
+
+GRANULARIDADES = ("D", "W", "M")
+NOMBRES_GRANULARIDAD = {"D": "diaria", "W": "semanal", "M": "mensual"}
+DIAS_POR_PUNTO = {"D": 1, "W": 7, "M": 30.4}
+
+
+def presupuesto_puntos(ancho_pantalla):
+    """Un punto por píxel del área de la gráfica; un ancho inválido usa el por defecto."""
+    try:
+        ancho = float(ancho_pantalla or ANCHO_DEFECTO)
+    except (TypeError, ValueError):
+        ancho = ANCHO_DEFECTO
+    if not np.isfinite(ancho):
+        ancho = ANCHO_DEFECTO
+    ancho = min(ancho, ANCHO_MAXIMO)
+    return max(PUNTOS_MINIMOS, int(ancho * FRACCION_GRAFICO))
+
+
+def elegir_granularidad(start_date, end_date, presupuesto):
+    # Sin alguna de las fechas no se sabe el largo del rango (como en cliente.js)
+    if pd.isna(pd.Timestamp(start_date)) or pd.isna(pd.Timestamp(end_date)):
+        return GRANULARIDADES[0]
+    dias = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    for granularidad in GRANULARIDADES:
+        if dias / DIAS_POR_PUNTO[granularidad] <= FACTOR_LTTB * presupuesto:
+            return granularidad
+    return GRANULARIDADES[-1]
+
+
+def truncar_fechas(fechas, granularidad):
+    """Lleva cada fecha al inicio de su semana (lunes) o mes."""
+    valores = pd.to_datetime(fechas).to_numpy(dtype="datetime64[ns]")
+    if granularidad == "W":
+        dias = valores.astype("datetime64[D]")
+        # 1970-01-01 fue jueves: se retrocede al lunes anterior
+        desplazamiento = (dias.astype("int64") + 3) % 7
+        valores = (dias - desplazamiento.astype("timedelta64[D]")).astype("datetime64[ns]")
+    elif granularidad == "M":
+        valores = valores.astype("datetime64[M]").astype("datetime64[ns]")
+    return valores
+
+
+def lttb(x, y, umbral):
+    """Índices de los `umbral` puntos que elige Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if umbral >= n or umbral < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.nan_to_num(np.asarray(y, dtype="float64"))
+
+    # Límites de los umbral-2 baldes interiores; el último tramo es el punto final
+    limites = np.linspace(1, n - 1, umbral - 1).astype("int64")
+    tamanos = np.diff(np.r_[limites, n])
+    medias_x = (np.add.reduceat(x, limites) / tamanos).tolist()
+    medias_y = (np.add.reduceat(y, limites) / tamanos).tolist()
+
+    # Cada balde depende del punto elegido en el anterior, así que el
+    # recorrido es secuencial: se hace sobre floats de Python, que con
+    # baldes de pocos puntos cuesta mucho menos que varias llamadas a numpy
+    xs, ys, limites = x.tolist(), y.tolist(), limites.tolist()
+    indices = [0]
+    anterior = 0
+    for i in range(umbral - 2):
+        x_ant, y_ant = xs[anterior], ys[anterior]
+        dx = x_ant - medias_x[i + 1]
+        dy = medias_y[i + 1] - y_ant
+        mejor, mayor = limites[i], -1.0
+        for k in range(limites[i], limites[i + 1]):
+            area = abs(dx * (ys[k] - y_ant) - (x_ant - xs[k]) * dy)
+            if area > mayor:
+                mejor, mayor = k, area
+        indices.append(mejor)
+        anterior = mejor
+    indices.append(n - 1)
+    return np.array(indices, dtype="int64")
+
+
+def reducir_series(df, x, y, color=None, presupuesto=ANCHO_DEFECTO):
+    """Aplica LTTB a cada serie (una por valor de `color`) de `df`."""
+    if color is None:
+        grupos = [df]
+    else:
+        grupos = [grupo for _, grupo in df.groupby(color, observed=True, sort=False)]
+    if all(len(grupo) <= presupuesto for grupo in grupos):
+        return df
+
+    partes = []
+    for grupo in grupos:
+        grupo = grupo.sort_values(x)
+        eje_x = grupo[x].to_numpy(dtype="datetime64[ns]").astype("int64")
+        partes.append(grupo.iloc[lttb(eje_x, grupo[y].to_numpy(), presupuesto)])
+    return pd.concat(partes, ignore_index=True)
+
+
+def modo_render(df):
+    return "webgl" if len(df) > PUNTOS_WEBGL else "auto"
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+
+import pytest
+from dash.exceptions import PreventUpdate
+
+from ejecucion import EjecutorCallbacks, punto_de_control
+
+# Tope para cualquier espera: si se supera, el pool quedó trabado
+TIMEOUT = 10
+
+
+def lanzar(ejecutor, nombre, funcion, args, pagina, resultados):
+    """Llama a `ejecutar` en un hilo y anota el resultado (o PreventUpdate)."""
+    def correr():
+        try:
+            resultados.append((pagina, args, ejecutor.ejecutar(nombre, funcion, args, pagina)))
+        except PreventUpdate:
+            resultados.append((pagina, args, PreventUpdate))
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    return hilo
+
+
+def esperar(hilos):
+    for hilo in hilos:
+        hilo.join(TIMEOUT)
+        assert not hilo.is_alive(), "el pool no respondió: posible interbloqueo"
+
+
+def test_peticiones_identicas_comparten_un_calculo():
+    ejecutor = EjecutorCallbacks(hilos=2)
+    llamadas = []
+    liberar = threading.Event()
+
+    def calcular(x):
+        llamadas.append(x)
+        liberar.wait(TIMEOUT)
+        return x * 2
+
+    resultados = []
+    hilos = [lanzar(ejecutor, "cb", calcular, (21,), f"pagina-{i}", resultados) for i in range(8)]
+    time.sleep(0.1)
+    liberar.set()
+    esperar(hilos)
+
+    assert llamadas == [21]
+    assert [r for _, _, r in resultados] == [42] * 8
+
+
+def test_peticion_nueva_supera_a_la_anterior_de_la_misma_pagina():
+    ejecutor = EjecutorCallbacks(hilos=1)
+    empezo = threading.Event()
+    liberar = threading.Event()
+
+    def calcular(x):
+        empezo.set()
+        liberar.wait(TIMEOUT)
+        return x
+
+    resultados = []
+    vieja = lanzar(ejecutor, "cb", calcular, (1,), "a", resultados)
+    assert empezo.wait(TIMEOUT)
+    nueva = lanzar(ejecutor, "cb", calcular, (2,), "a", resultados)
+    esperar([vieja])
+    liberar.set()
+    esperar([nueva])
+
+    assert dict((args, r) for _, args, r in resultados) == {(1,): PreventUpdate, (2,): 2}
+
+
+def test_paginas_distintas_no_se_superan():
+    ejecutor = EjecutorCallbacks(hilos=2)
+    liberar = threading.Event()
+
+    def calcular(x):
+        liberar.wait(TIMEOUT)
+        return x
+
+    resultados = []
+    hilos = [
+        lanzar(ejecutor, "cb", calcular, (1,), "pestana-1", resultados),
+        lanzar(ejecutor, "cb", calcular, (2,), "pestana-2", resultados),
+    ]
+    time.sleep(0.1)
+    liberar.set()
+    esperar(hilos)
+
+    assert sorted(r for _, _, r in resultados) == [1, 2]
+
+
+def test_tarea_superada_se_abandona_en_el_punto_de_control():
+    ejecutor = EjecutorCallbacks(hilos=1)
+    empezo = threading.Event()
+    seguir = threading.Event()
+    terminadas = []
+
+    def calcular(x):
+        empezo.set()
+        seguir.wait(TIMEOUT)
+        punto_de_control()
+        terminadas.append(x)
+        return x
+
+    resultados = []
+    vieja = lanzar(ejecutor, "cb", calcular, (1,), "a", resultados)
+    assert empezo.wait(TIMEOUT)
+    nueva = lanzar(ejecutor, "cb", calcular, (2,), "a", resultados)
+    esperar([vieja])
+    seguir.set()
+    esperar([nueva])
+
+    assert terminadas == [2]
+
+
+@pytest.mark.parametrize("hilos_pool", [1, 2, 8])
+def test_rafagas_concurrentes_no_traban_el_pool(hilos_pool):
+    # Muchas páginas arrastrando el rango a la vez: cada ráfaga supera (y
+    # cancela en la cola) peticiones de la misma página mientras otras
+    # páginas piden las mismas entradas.
+    ejecutor = EjecutorCallbacks(hilos=hilos_pool)
+    rng = random.Random(hilos_pool)
+
+    def calcular(x):
+        time.sleep(rng.random() / 500)
+        punto_de_control()
+        return x
+
+    resultados = []
+    hilos = []
+    for paso in range(400):
+        pagina = f"pagina-{rng.randrange(10)}"
+        nombre = rng.choice(["conversion", "rentabilidad"])
+        hilos.append(lanzar(ejecutor, nombre, calcular, (rng.randrange(5),), pagina, resultados))
+        if paso % 20 == 0:
+            time.sleep(0.001)
+    esperar(hilos)
+
+    assert len(resultados) == len(hilos)
+    for _, args, resultado in resultados:
+        assert resultado is PreventUpdate or resultado == args[0]
+    # Sin peticiones esperando no queda nada registrado
+    assert ejecutor._en_curso == {}
+    assert ejecutor._ultima == {}